@@ -1,26 +1,70 @@
 # apps/api/app/api/v1/endpoints/dicom.py
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from pathlib import Path
-import pydicom
-from PIL import Image
+from typing import Iterator, List, Optional, Tuple
 import numpy as np
-import io
+from PIL import Image
+from pydicom.uid import ExplicitVRLittleEndian
 
+from app.api.v1.etags import etag_matches, make_etag
 from app.core.deps import get_db, get_current_user
 from app.models.models import Instance, User
 from app.core.config import settings
+from app.services.imaging_pool import imaging_pool
+from app.services.render_cache import render_cache
+from app.services.store import source_version
+from app.services.frames import MEDIA_TYPES as FRAME_MEDIA_TYPES, FrameIndexError, read_frame
+from app.services.thumbnails import build_sprite, nearest_thumbnail
+from app.services.tiles import tile_pyramid
+from app.services.pixel_cache import pixel_cache
+from app.services.rendering import render_frame, encode_image, media_type, to_image
 
 router = APIRouter()
 
+def _byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single bytes range, None to send the whole file"""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        # Multipart ranges are not worth it for DICOM; send everything
+        return None
+    
+    start, _, end = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if start:
+            first, last = int(start), int(end) if end else size - 1
+        else:
+            # Suffix range: the last N bytes
+            first, last = max(size - int(end), 0), size - 1
+    except ValueError:
+        return None
+    
+    if first > last or first >= size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return first, min(last, size - 1)
+
+def _file_chunks(file_path: Path, start: int, length: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
 @router.get("/{instance_id}/p10")
 async def get_dicom_file(
     instance_id: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get DICOM P10 file for Cornerstone loading"""
+    """Get DICOM P10 file for Cornerstone loading, with conditional and range requests"""
     instance = db.query(Instance).filter(Instance.id == instance_id).first()
     if not instance:
         raise HTTPException(status_code=404, detail="Instance not found")
@@ -29,13 +73,36 @@ async def get_dicom_file(
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="DICOM file not found on disk")
     
+    etag = make_etag(source_version(file_path))
+    headers = {
+        "Content-Disposition": f"attachment; filename={instance.sop_uid}.dcm",
+        "Cache-Control": "public, max-age=3600",
+        "Accept-Ranges": "bytes",
+        "ETag": etag
+    }
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
+    # A stale If-Range validator means the client's partial copy is useless
+    if_range = request.headers.get("if-range")
+    size = file_path.stat().st_size
+    byte_range = _byte_range(request.headers.get("range"), size) if if_range in (None, etag) else None
+    
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            _file_chunks(file_path, start, end - start + 1),
+            status_code=206,
+            media_type="application/dicom",
+            headers=headers
+        )
+    
     return FileResponse(
         path=str(file_path),
         media_type="application/dicom",
-        headers={
-            "Content-Disposition": f"attachment; filename={instance.sop_uid}.dcm",
-            "Cache-Control": "public, max-age=3600"
-        }
+        headers=headers
     )
 
 @router.get("/{instance_id}/meta")
@@ -57,14 +124,53 @@ async def get_instance_metadata(
         "meta": instance.meta_json
     }
 
-@router.get("/{instance_id}/frame/{frame_number}")
-async def get_frame_image(
+def _render_frame(
     instance_id: int,
-    frame_number: int = 0,
+    file_path: Path,
+    frame_number: int,
+    window_center: Optional[float],
+    window_width: Optional[float],
+    size: Optional[int],
+    format: str
+) -> bytes:
+    try:
+        ds, pixels = pixel_cache.frame(instance_id, str(file_path), frame_number)
+    except IndexError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    image = render_frame(ds, pixels, window_center, window_width)
+    return encode_image(image, format, size)
+
+def _render_cached(cache_key: str, *render_args) -> bytes:
+    """Disk cache lookup, then render on a miss; runs on the imaging pool"""
+    content = render_cache.get(cache_key)
+    if content is None:
+        content = _render_frame(*render_args)
+        render_cache.put(cache_key, content)
+    return content
+
+def _raw_frame(instance_id: int, file_path: Path, frame_index: int) -> Tuple[bytes, str, bool]:
+    """Frame bytes as stored; runs on the imaging pool"""
+    try:
+        return read_frame(str(file_path), frame_index)
+    except FrameIndexError:
+        # Deflated or bit-packed files: send decoded values, explicit little endian
+        _, pixels = pixel_cache.frame(instance_id, str(file_path), frame_index)
+        pixels = np.ascontiguousarray(pixels, dtype=pixels.dtype.newbyteorder("<"))
+        return pixels.tobytes(), ExplicitVRLittleEndian, False
+
+@router.get("/{instance_id}/frames/{frame_number}")
+async def get_raw_frame(
+    instance_id: int,
+    frame_number: int,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get specific frame as PNG for thumbnails/preview"""
+    """Get one frame in its stored encoding, WADO-RS style (frame numbers start at 1)"""
+    if frame_number < 1:
+        raise HTTPException(status_code=400, detail="Frame numbers start at 1")
+    
     instance = db.query(Instance).filter(Instance.id == instance_id).first()
     if not instance:
         raise HTTPException(status_code=404, detail="Instance not found")
@@ -73,105 +179,216 @@ async def get_frame_image(
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="DICOM file not found")
     
+    version = source_version(file_path)
+    etag = make_etag(version, frame_number)
+    headers = {"Cache-Control": "public, max-age=3600", "ETag": etag}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    
     try:
-        # Read DICOM file
-        ds = pydicom.dcmread(str(file_path))
-        
-        # Get pixel array
-        pixel_array = ds.pixel_array
-        
-        # Handle multi-frame
-        if len(pixel_array.shape) == 3:
-            if frame_number >= pixel_array.shape[0]:
-                raise HTTPException(status_code=400, detail="Frame number out of range")
-            pixel_array = pixel_array[frame_number]
-        elif frame_number > 0:
-            raise HTTPException(status_code=400, detail="Single frame image, frame number must be 0")
-        
-        # Apply window/level if available
-        window_center = float(getattr(ds, 'WindowCenter', None) or pixel_array.mean())
-        window_width = float(getattr(ds, 'WindowWidth', None) or (pixel_array.max() - pixel_array.min()))
-        
-        # Apply windowing
-        img_min = window_center - window_width / 2
-        img_max = window_center + window_width / 2
-        
-        pixel_array = np.clip(pixel_array, img_min, img_max)
-        pixel_array = ((pixel_array - img_min) / (img_max - img_min) * 255).astype(np.uint8)
-        
-        # Convert to PIL Image
-        img = Image.fromarray(pixel_array, mode='L')
-        
-        # Convert to PNG bytes
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='PNG')
-        img_bytes.seek(0)
-        
-        return StreamingResponse(
-            io.BytesIO(img_bytes.read()),
-            media_type="image/png",
-            headers={"Cache-Control": "public, max-age=3600"}
+        content, transfer_syntax, encapsulated = await imaging_pool.run(
+            'raw_frame', (instance.id, version, frame_number), _raw_frame,
+            instance.id, file_path, frame_number - 1
         )
-        
+    except IndexError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing DICOM: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reading frame: {str(e)}")
+    
+    frame_type = FRAME_MEDIA_TYPES.get(transfer_syntax, "application/octet-stream") if encapsulated else "application/octet-stream"
+    return Response(
+        content=content,
+        media_type=f"{frame_type}; transfer-syntax={transfer_syntax}",
+        headers=headers
+    )
+
+@router.get("/{instance_id}/frame/{frame_number}")
+async def get_frame_image(
+    instance_id: int,
+    frame_number: int = 0,
+    window_center: Optional[float] = Query(None, alias="wc"),
+    window_width: Optional[float] = Query(None, alias="ww", gt=0),
+    size: Optional[int] = Query(None, gt=0, le=4096),
+    format: str = Query("png", pattern="^(png|jpeg|webp)$"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get specific frame as an image, optionally windowed and downscaled"""
+    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    if not instance:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    
+    file_path = Path(instance.path_abs)
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="DICOM file not found")
+    
+    cache_key = render_cache.key(
+        instance.id, source_version(file_path), frame_number, window_center, window_width, size, format
+    )
+    content = render_cache.peek(cache_key)
+    
+    if content is None:
+        try:
+            content = await imaging_pool.run(
+                'frame', cache_key, _render_cached,
+                cache_key, instance.id, file_path, frame_number, window_center, window_width, size, format
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error processing DICOM: {str(e)}")
+    
+    return Response(
+        content=content,
+        media_type=media_type(format),
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
+
+# Instances per batch thumbnail request
+THUMBNAIL_BATCH_LIMIT = getattr(settings, 'THUMBNAIL_BATCH_LIMIT', 200)
 
 @router.get("/{instance_id}/thumbnail")
 async def get_thumbnail(
     instance_id: int,
-    size: int = 256,
+    size: int = Query(256, gt=0, le=1024),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get thumbnail image"""
+    """Get thumbnail image; served from the smallest precomputed size that fits"""
     instance = db.query(Instance).filter(Instance.id == instance_id).first()
     if not instance:
         raise HTTPException(status_code=404, detail="Instance not found")
     
     # Check if thumbnail exists
-    if instance.thumbnail_path and Path(instance.thumbnail_path).exists():
+    thumb_path = nearest_thumbnail(instance.thumbnail_path, size)
+    if thumb_path is not None:
         return FileResponse(
-            path=instance.thumbnail_path,
+            path=str(thumb_path),
             media_type="image/jpeg",
             headers={"Cache-Control": "public, max-age=3600"}
         )
     
     # Generate thumbnail on-the-fly if not exists
+    file_path = Path(instance.path_abs)
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="DICOM file not found")
+    
+    cache_key = render_cache.key(instance.id, source_version(file_path), 0, None, None, size, 'jpeg')
+    content = render_cache.peek(cache_key)
+    
+    if content is None:
+        try:
+            content = await imaging_pool.run(
+                'thumbnail', cache_key, _render_cached,
+                cache_key, instance.id, file_path, 0, None, None, size, 'jpeg'
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error generating thumbnail: {str(e)}")
+    
+    return Response(
+        content=content,
+        media_type="image/jpeg",
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
+
+def _sprite(instances: List[Tuple[int, str, Optional[str]]], size: int) -> dict:
+    """Load or render each thumbnail and pack them; runs on the imaging pool"""
+    images = []
+    for instance_id, path_abs, thumbnail_path in instances:
+        try:
+            thumb_path = nearest_thumbnail(thumbnail_path, size)
+            if thumb_path is not None:
+                with Image.open(thumb_path) as img:
+                    # JPEG draft mode decodes straight at a reduced scale
+                    img.draft(img.mode, (size, size))
+                    images.append((instance_id, img.copy()))
+            else:
+                # Not through the pixel stage yet
+                ds, pixels = pixel_cache.frame(instance_id, path_abs, 0)
+                images.append((instance_id, to_image(render_frame(ds, pixels), size)))
+        except Exception as e:
+            # One unreadable instance must not fail the whole batch
+            print(f"Thumbnail error for instance {instance_id}: {e}")
+    return build_sprite(images, size)
+
+@router.get("/thumbnails")
+async def get_thumbnail_batch(
+    ids: str = Query(..., pattern=r"^\d+(,\d+)*$"),
+    size: int = Query(128, gt=0, le=1024),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get many thumbnails in one round-trip, as a base64 JPEG sprite with an offset map"""
+    instance_ids = list(dict.fromkeys(int(instance_id) for instance_id in ids.split(",")))
+    if len(instance_ids) > THUMBNAIL_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {THUMBNAIL_BATCH_LIMIT} thumbnails per request")
+    
+    rows = db.query(Instance.id, Instance.path_abs, Instance.thumbnail_path).filter(
+        Instance.id.in_(instance_ids)
+    ).all()
+    found = {row.id: tuple(row) for row in rows}
+    instances = [found[instance_id] for instance_id in instance_ids if instance_id in found]
+    
     try:
-        file_path = Path(instance.path_abs)
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="DICOM file not found")
-        
-        ds = pydicom.dcmread(str(file_path))
-        pixel_array = ds.pixel_array
-        
-        if len(pixel_array.shape) == 3:
-            pixel_array = pixel_array[0]  # First frame only
-        
-        # Window level adjustment
-        window_center = float(getattr(ds, 'WindowCenter', pixel_array.mean()))
-        window_width = float(getattr(ds, 'WindowWidth', pixel_array.max() - pixel_array.min()))
-        
-        img_min = window_center - window_width / 2
-        img_max = window_center + window_width / 2
-        
-        pixel_array = np.clip(pixel_array, img_min, img_max)
-        pixel_array = ((pixel_array - img_min) / (img_max - img_min) * 255).astype(np.uint8)
-        
-        # Create and resize image
-        img = Image.fromarray(pixel_array)
-        img.thumbnail((size, size), Image.Resampling.LANCZOS)
-        
-        # Convert to bytes
-        img_bytes = io.BytesIO()
-        img.save(img_bytes, format='JPEG', quality=85)
-        img_bytes.seek(0)
-        
-        return StreamingResponse(
-            io.BytesIO(img_bytes.read()),
-            media_type="image/jpeg",
-            headers={"Cache-Control": "public, max-age=3600"}
-        )
-        
+        sprite = await imaging_pool.run('thumbnail_sprite', (tuple(instances), size), _sprite, instances, size)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error generating thumbnail: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error generating thumbnails: {str(e)}")
+    
+    missing = [instance_id for instance_id in instance_ids if str(instance_id) not in sprite['offsets']]
+    return {**sprite, 'missing': missing}
+
+async def _ensure_tiles(instance: Instance) -> dict:
+    file_path = Path(instance.path_abs)
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="DICOM file not found")
+    
+    version = source_version(file_path)
+    manifest = tile_pyramid.manifest(instance.id, version)
+    if manifest is not None:
+        return manifest
+    
+    # First access builds the whole pyramid once, shared by concurrent viewers
+    try:
+        return await imaging_pool.run('tiles', (instance.id, version), tile_pyramid.ensure, instance.id, str(file_path))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building tiles: {str(e)}")
+
+@router.get("/{instance_id}/tiles")
+async def get_tile_pyramid(
+    instance_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get tile pyramid layout; level 0 is a single overview tile"""
+    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    if not instance:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    
+    return await _ensure_tiles(instance)
+
+@router.get("/{instance_id}/tiles/{level}/{x}/{y}")
+async def get_tile(
+    instance_id: int,
+    level: int,
+    x: int,
+    y: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get a single JPEG tile of the pyramid"""
+    instance = db.query(Instance).filter(Instance.id == instance_id).first()
+    if not instance:
+        raise HTTPException(status_code=404, detail="Instance not found")
+    
+    manifest = await _ensure_tiles(instance)
+    tile_path = tile_pyramid.tile_path(instance.id, manifest['version'], level, x, y)
+    if not tile_path.exists():
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    
+    return FileResponse(
+        path=str(tile_path),
+        media_type="image/jpeg",
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
\ No newline at end of file
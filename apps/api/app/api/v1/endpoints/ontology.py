@@ -1,58 +1,63 @@
 # apps/api/app/api/v1/endpoints/ontology.py
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List
 
+from app.api.v1.etags import etag_matches
 from app.core.deps import get_db, get_current_user
-from app.models.models import OntologyClass, User
+from app.models.models import User
 from app.schemas.ontology import OntologyClassResponse
+from app.services.ontology import ontology_registry
 
 router = APIRouter()
 
+# Clients may reuse a copy but must revalidate it, which costs a 304
+ONTOLOGY_CACHE_CONTROL = "private, no-cache"
+
+def _cache_headers(response: Response, etag: str, version: int):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = ONTOLOGY_CACHE_CONTROL
+    response.headers["X-Ontology-Version"] = str(version)
+
 @router.get("/classes", response_model=List[OntologyClassResponse])
 async def get_ontology_classes(
+    request: Request,
+    response: Response,
     kind: Optional[str] = Query(None, description="Filter by kind: pathology or device"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get ontology classes"""
-    query = db.query(OntologyClass).filter(OntologyClass.is_active == True)
+    snapshot = ontology_registry.snapshot(db)
+    etag = snapshot.etag(kind or "all")
     
-    if kind:
-        query = query.filter(OntologyClass.kind == kind)
+    if etag_matches(request, etag):
+        not_modified = Response(status_code=304)
+        _cache_headers(not_modified, etag, snapshot.version)
+        return not_modified
     
-    classes = query.order_by(OntologyClass.priority).all()
-    
-    return [
-        {
-            "id": cls.id,
-            "name": cls.name,
-            "name_tr": cls.name_tr,
-            "kind": cls.kind,
-            "color": cls.color,
-            "priority": cls.priority,
-            "is_active": cls.is_active
-        }
-        for cls in classes
-    ]
+    _cache_headers(response, etag, snapshot.version)
+    return [entry.to_dict() for entry in snapshot.active(kind)]
 
 @router.get("/classes/{class_id}", response_model=OntologyClassResponse)
 async def get_ontology_class(
     class_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get specific ontology class"""
-    cls = db.query(OntologyClass).filter(OntologyClass.id == class_id).first()
+    snapshot = ontology_registry.snapshot(db)
+    cls = snapshot.get(class_id)
     if not cls:
         raise HTTPException(status_code=404, detail="Ontology class not found")
     
-    return {
-        "id": cls.id,
-        "name": cls.name,
-        "name_tr": cls.name_tr,
-        "kind": cls.kind,
-        "color": cls.color,
-        "priority": cls.priority,
-        "is_active": cls.is_active
-    }
\ No newline at end of file
+    etag = snapshot.etag(class_id)
+    if etag_matches(request, etag):
+        not_modified = Response(status_code=304)
+        _cache_headers(not_modified, etag, snapshot.version)
+        return not_modified
+    
+    _cache_headers(response, etag, snapshot.version)
+    return cls.to_dict()
\ No newline at end of file
@@ -1,12 +1,17 @@
 # apps/api/app/api/v1/endpoints/stats.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from datetime import datetime, date, timedelta
-from typing import Dict
+from datetime import date
+from typing import Dict, Optional
 
 from app.core.deps import get_db, get_current_user
-from app.models.models import Task, Study, Annotation, User, TaskStatus
+from app.models.models import User
+from app.services.counters import overview
+from app.services.findings import pathology_distribution
+from app.services.live_stats import live_stats
+from app.services.ontology import ontology_registry
+from app.services.timeline import completion_timeline, TIMELINE_MAX_DAYS
 
 router = APIRouter()
 
@@ -16,116 +21,93 @@ async def get_overview_stats(
     db: Session = Depends(get_db)
 ) -> Dict:
     """Get dashboard statistics"""
+    # Served from the counter rollup; see app.services.counters
+    return overview(db, current_user.id)
+
+@router.get("/stream")
+async def stream_stats(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Live dashboard statistics as server-sent events
     
-    # Total studies
-    total_studies = db.query(Study).count()
-    
-    # Completed tasks
-    completed_tasks = db.query(Task).filter(
-        Task.status == TaskStatus.COMPLETED
-    ).count()
-    
-    # Positive findings vocabulary (unique positive pathology annotations)
-    positive_vocab = db.query(Annotation.class_id).filter(
-        and_(
-            Annotation.polarity == 'pos',
-            Annotation.type == 'scribble'
-        )
-    ).distinct().count()
-    
-    # Completed by current user
-    done_by_me = db.query(Task).filter(
-        and_(
-            Task.assignee_id == current_user.id,
-            Task.status == TaskStatus.COMPLETED
-        )
-    ).count()
-    
-    # Queued tasks
-    queued = db.query(Task).filter(
-        Task.status == TaskStatus.QUEUED
-    ).count()
-    
-    # Today's completed
-    today_start = datetime.combine(date.today(), datetime.min.time())
-    today_done = db.query(Task).filter(
-        and_(
-            Task.status == TaskStatus.COMPLETED,
-            Task.updated_at >= today_start
-        )
-    ).count()
+    Sends the overview once, then coalesced deltas as tasks are claimed
+    and completed and studies are ingested.
+    """
+    # Listen before reading, so no change falls between the two
+    queue = live_stats.listen()
+    try:
+        snapshot = overview(db, current_user.id, fresh=True)
+    except Exception:
+        live_stats.unlisten(queue)
+        raise
+    # The stream can stay open for hours; don't hold a connection for it
+    db.close()
     
-    return {
-        'total': total_studies,
-        'done': completed_tasks,
-        'positive_vocab': positive_vocab,
-        'done_by_me': done_by_me,
-        'queued': queued,
-        'today_done': today_done
-    }
+    return StreamingResponse(
+        live_stats.stream(queue, current_user.id, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.get("/timeline")
 async def get_timeline_stats(
-    days: int = 7,
+    days: int = Query(7, ge=1, le=TIMELINE_MAX_DAYS),
+    granularity: str = Query('day', pattern='^(day|week|month)$'),
+    group_by: Optional[str] = Query(None, pattern='^(user|class)$'),
+    tz: Optional[str] = Query(None, description="IANA time zone for bucket boundaries"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get completion timeline for charts"""
-    end_date = date.today()
-    start_date = end_date - timedelta(days=days-1)
+    try:
+        timeline = completion_timeline(db, days, granularity, group_by, tz)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Get daily counts
-    daily_stats = []
-    current_date = start_date
+    if group_by is None:
+        return [
+            {'date': period.isoformat(), 'count': counts.get(None, 0)}
+            for period, counts in timeline
+        ]
     
-    while current_date <= end_date:
-        day_start = datetime.combine(current_date, datetime.min.time())
-        day_end = day_start + timedelta(days=1)
-        
-        count = db.query(Task).filter(
-            and_(
-                Task.status == TaskStatus.COMPLETED,
-                Task.updated_at >= day_start,
-                Task.updated_at < day_end
-            )
-        ).count()
-        
-        daily_stats.append({
-            'date': current_date.isoformat(),
-            'count': count
-        })
-        
-        current_date += timedelta(days=1)
+    # Labels for every user or class in the range, in one query
+    ids = {group for _, counts in timeline for group in counts if group is not None}
+    labels = {}
+    if ids and group_by == 'user':
+        labels = {
+            user_id: full_name or email
+            for user_id, full_name, email in db.query(User.id, User.full_name, User.email).filter(User.id.in_(ids))
+        }
+    elif ids:
+        snapshot = ontology_registry.snapshot(db)
+        labels = {
+            class_id: snapshot.get(class_id).name_tr or snapshot.get(class_id).name
+            for class_id in ids if snapshot.get(class_id)
+        }
     
-    return daily_stats
+    return [
+        {
+            'date': period.isoformat(),
+            'count': sum(counts.values()),
+            'groups': [
+                {'id': group, 'name': labels.get(group), 'count': count}
+                for group, count in sorted(counts.items(), key=lambda item: -item[1])
+            ]
+        }
+        for period, counts in timeline
+    ]
 
 @router.get("/pathology-distribution")
 async def get_pathology_distribution(
+    start: Optional[date] = Query(None, description="First UTC day, inclusive"),
+    end: Optional[date] = Query(None, description="Last UTC day, inclusive"),
+    ward: Optional[str] = None,
+    annotator_id: Optional[int] = None,
+    kind: Optional[str] = Query('scribble', description="Annotation kind: scribble, polyline, mask"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get distribution of pathology findings"""
-    results = db.query(
-        Annotation.class_id,
-        func.count(Annotation.id).label('count')
-    ).filter(
-        and_(
-            Annotation.type == 'scribble',
-            Annotation.polarity == 'pos'
-        )
-    ).group_by(Annotation.class_id).all()
-    
-    distribution = []
-    for class_id, count in results:
-        onto_class = db.query(OntologyClass).filter(
-            OntologyClass.id == class_id
-        ).first()
-        
-        if onto_class:
-            distribution.append({
-                'name': onto_class.name_tr or onto_class.name,
-                'count': count,
-                'color': onto_class.color
-            })
-    
-    return distribution
\ No newline at end of file
+    # Read from the finding rollup; see app.services.findings
+    return pathology_distribution(db, ontology_registry.snapshot(db), start, end, ward, annotator_id, kind)
\ No newline at end of file
@@ -1,51 +1,75 @@
 # apps/api/app/api/v1/endpoints/tasks.py
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
+from typing import List
 
 from app.core.deps import get_db, get_current_user
-from app.models.models import Task, Study, TaskStatus, User
+from app.models.models import Instance, Task, Study, TaskStatus, User
 from app.schemas.task import TaskResponse, TaskCreate, TaskUpdate
+from app.services.prefetch import cache_warmer, PREFETCH_MAX
+from app.services.leases import lease_store, LEASE_TTL
+from app.services.task_queue import claim_next_task, claim_tasks, heartbeat, upcoming_tasks, TASK_CLAIM_MAX
 
 router = APIRouter()
 
+def _prefetch_hints(db: Session, user: User, limit: int, response: Response):
+    """Hint at the tasks likely to come next and warm their caches"""
+    candidates = upcoming_tasks(db, user, limit)
+    if not candidates:
+        return
+    
+    instances = db.query(Instance.id, Instance.path_abs).filter(
+        Instance.study_id.in_([candidate.study_id for candidate in candidates])
+    ).order_by(Instance.study_id, Instance.instance_number).all()
+    
+    response.headers["X-Prefetch-Task-Ids"] = ",".join(str(candidate.id) for candidate in candidates)
+    response.headers["X-Prefetch-Instance-Ids"] = ",".join(str(instance.id) for instance in instances)
+    cache_warmer.submit((instance.id, instance.path_abs) for instance in instances)
+
 @router.post("/next", response_model=TaskResponse)
 async def get_next_task(
+    response: Response,
+    prefetch: int = Query(0, ge=0, le=PREFETCH_MAX),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Release expired locks
-    expired_time = datetime.utcnow() - timedelta(minutes=30)
-    db.query(Task).filter(
-        and_(
-            Task.status == TaskStatus.LOCKED,
-            Task.lock_expires_at < datetime.utcnow()
-        )
-    ).update({
-        "status": TaskStatus.QUEUED,
-        "assignee_id": None,
-        "lock_expires_at": None
-    })
-    db.commit()
-    
-    # Get next available task
-    task = db.query(Task).filter(
-        Task.status == TaskStatus.QUEUED
-    ).order_by(Task.created_at).first()
-    
+    # Expired locks are returned to the queue by the background lease reaper
+    task = claim_next_task(db, current_user)
     if not task:
         raise HTTPException(status_code=404, detail="Kuyrukta bekleyen görev yok")
     
-    # Lock task
-    task.status = TaskStatus.LOCKED
-    task.assignee_id = current_user.id
-    task.lock_expires_at = datetime.utcnow() + timedelta(minutes=30)
-    db.commit()
-    db.refresh(task)
+    if prefetch:
+        _prefetch_hints(db, current_user, prefetch, response)
     
     return task
 
+@router.post("/claim", response_model=List[TaskResponse])
+async def claim_task_batch(
+    count: int = Query(1, ge=1, le=TASK_CLAIM_MAX),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Claim up to count tasks at once, highest priority first"""
+    return claim_tasks(db, current_user, count)
+
+@router.post("/{task_id}/heartbeat")
+async def renew_task_lease(
+    task_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Extend the lease on a task the user is working on; no database writes"""
+    expires_at = heartbeat(db, task_id, current_user)
+    if expires_at is None:
+        raise HTTPException(status_code=409, detail="Görev kilidi kaybedildi")
+    
+    return {
+        "lease_expires_at": datetime.utcfromtimestamp(expires_at).isoformat(),
+        "lease_ttl": LEASE_TTL
+    }
+
 @router.post("/{task_id}/complete")
 async def complete_task(
     task_id: int,
@@ -62,9 +86,11 @@ async def complete_task(
     if not task:
         raise HTTPException(status_code=404, detail="Görev bulunamadı")
     
+    # Counters follow the status change through the ORM flush
     task.status = TaskStatus.COMPLETED
     task.updated_at = datetime.utcnow()
     db.commit()
+    lease_store.release(task_id)
     
     return {"status": "success", "message": "Görev tamamlandı"}
 
@@ -84,9 +110,13 @@ async def release_task(
     if not task:
         raise HTTPException(status_code=404, detail="Görev bulunamadı")
     
-    task.status = TaskStatus.QUEUED
+    # Review cases go back to the review queue
+    requeue_to = task.claimed_from or TaskStatus.QUEUED
+    task.status = requeue_to
+    task.claimed_from = None
     task.assignee_id = None
     task.lock_expires_at = None
     db.commit()
+    lease_store.release(task_id)
     
     return {"status": "success", "message": "Görev serbest bırakıldı"}
\ No newline at end of file
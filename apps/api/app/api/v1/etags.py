@@ -0,0 +1,13 @@
+# apps/api/app/api/v1/etags.py
+from fastapi import Request
+
+def make_etag(*parts) -> str:
+    return '"' + '-'.join(str(part) for part in parts) + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check; weak comparison, as for GET"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
\ No newline at end of file
@@ -1,26 +1,45 @@
 # apps/api/app/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import engine, Base
+from app.core.database import engine, Base, SessionLocal
 from app.api.v1.api import api_router
+from app.services.counters import ensure_counters
+from app.services.events import broker
 from app.services.indexer import IndexerService
+from app.services.imaging_pool import imaging_pool
+from app.services.prefetch import cache_warmer
+from app.services.task_queue import lease_reaper
+from app.services.metrics import REGISTRY
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     Base.metadata.create_all(bind=engine)
     
+    # Dashboard rollup for databases that predate it
+    db = SessionLocal()
+    try:
+        ensure_counters(db)
+    finally:
+        db.close()
+    
     # Start indexer service
     indexer = IndexerService()
     indexer.start()
+    lease_reaper.start()
     
     yield
     
     # Shutdown
+    lease_reaper.stop()
     indexer.stop()
+    cache_warmer.shutdown()
+    broker.stop()
+    imaging_pool.shutdown()
 
 app = FastAPI(
     title="NeoCXR Segmentation API",
@@ -34,10 +53,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Prefetch-Task-Ids", "X-Prefetch-Instance-Ids"],
 )
 
 app.include_router(api_router, prefix="/api/v1")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -1,5 +1,5 @@
 # apps/api/app/models/models.py
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, JSON, Enum, Boolean
+from sqlalchemy import Column, String, Integer, BigInteger, Date, DateTime, ForeignKey, JSON, Enum, Boolean, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -51,7 +51,7 @@ class Instance(Base):
     __tablename__ = "instances"
     
     id = Column(Integer, primary_key=True)
-    study_id = Column(Integer, ForeignKey("studies.id"))
+    study_id = Column(Integer, ForeignKey("studies.id"), index=True)
     sop_uid = Column(String, unique=True, index=True)
     instance_number = Column(Integer)
     path_abs = Column(String)
@@ -63,11 +63,37 @@ class Instance(Base):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Claim order of each role queue; only waiting rows are indexed
+        Index(
+            "ix_tasks_queued_claim", text("priority DESC"), "created_at", "id",
+            postgresql_where=text("status = 'QUEUED'"),
+            sqlite_where=text("status = 'QUEUED'")
+        ),
+        Index(
+            "ix_tasks_review_claim", text("priority DESC"), "created_at", "id",
+            postgresql_where=text("status = 'NEEDS_REVIEW'"),
+            sqlite_where=text("status = 'NEEDS_REVIEW'")
+        ),
+        # Lease reaper sweep over locked rows
+        Index(
+            "ix_tasks_locked_expiry", "lock_expires_at",
+            postgresql_where=text("status = 'LOCKED'"),
+            sqlite_where=text("status = 'LOCKED'")
+        ),
+        Index("ix_tasks_assignee_status", "assignee_id", "status"),
+        # Completion timelines, per annotator without touching the table
+        Index("ix_tasks_status_updated_assignee", "status", "updated_at", "assignee_id"),
+    )
     
     id = Column(Integer, primary_key=True)
-    study_id = Column(Integer, ForeignKey("studies.id"))
+    study_id = Column(Integer, ForeignKey("studies.id"), index=True)
     assignee_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     status = Column(Enum(TaskStatus), default=TaskStatus.QUEUED)
+    # Higher is claimed sooner; set by the scheduler's scoring policies
+    priority = Column(Integer, default=0, server_default=text("0"), nullable=False)
+    # Queue a locked task returns to on release or lock expiry
+    claimed_from = Column(Enum(TaskStatus), nullable=True)
     lock_expires_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -78,9 +104,13 @@ class Task(Base):
 
 class Annotation(Base):
     __tablename__ = "annotations"
+    __table_args__ = (
+        # Finding counts filter on type and polarity, then group by class
+        Index("ix_annotations_type_polarity_class", "type", "polarity", "class_id"),
+    )
     
     id = Column(Integer, primary_key=True)
-    task_id = Column(Integer, ForeignKey("tasks.id"))
+    task_id = Column(Integer, ForeignKey("tasks.id"), index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     type = Column(String)  # scribble, polyline, mask
     class_id = Column(Integer, ForeignKey("ontology_classes.id"))
@@ -103,4 +133,53 @@ class OntologyClass(Base):
     kind = Column(String)  # pathology, device
     color = Column(String)
     priority = Column(Integer, default=0)
-    is_active = Column(Boolean, default=True)
\ No newline at end of file
+    is_active = Column(Boolean, default=True)
+
+class OntologyImport(Base):
+    """One row per ontology import; the latest id is the ontology's version"""
+    __tablename__ = "ontology_imports"
+    
+    id = Column(Integer, primary_key=True)
+    imported_at = Column(DateTime, default=datetime.utcnow)
+
+class IngestRecord(Base):
+    __tablename__ = "ingest_journal"
+    
+    id = Column(Integer, primary_key=True)
+    path = Column(String, unique=True, index=True, nullable=False)
+    size = Column(BigInteger)
+    mtime_ns = Column(BigInteger)
+    content_hash = Column(String, nullable=True)
+    status = Column(String)  # indexed, failed
+    error = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class StatCounter(Base):
+    """Rollup of dashboard counts, maintained in the transactions that change them"""
+    __tablename__ = "stat_counters"
+    __table_args__ = (
+        UniqueConstraint("name", "scope", "shard", name="uq_stat_counters_name_scope_shard"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    scope = Column(String, nullable=False, default='')
+    # Hot counters are spread over shards so concurrent writers rarely share a row
+    shard = Column(Integer, nullable=False, default=0)
+    value = Column(BigInteger, nullable=False, default=0)
+
+class FindingCount(Base):
+    """Positive findings per day, class, annotator, ward and annotation kind"""
+    __tablename__ = "finding_counts"
+    __table_args__ = (
+        # Leads with day, so date-range reads scan only their slice
+        UniqueConstraint("day", "class_id", "user_id", "ward", "kind", name="uq_finding_counts_key"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)  # UTC day the annotation was made
+    class_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)  # 0 when the annotator is unknown
+    ward = Column(String, nullable=False, default='')
+    kind = Column(String, nullable=False)  # annotation type: scribble, polyline, mask
+    value = Column(BigInteger, nullable=False, default=0)
\ No newline at end of file
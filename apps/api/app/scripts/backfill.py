@@ -0,0 +1,143 @@
+# apps/api/app/scripts/backfill.py
+"""Bulk-load a historical DICOM archive without going through the inbox
+
+    python -m app.scripts.backfill /archive/nicu --workers 16 --rate 500
+
+Progress is checkpointed in the ingest journal after every committed
+batch, so rerunning the same command after a crash skips files that
+were already indexed.
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from app.core.database import SessionLocal
+from app.services.indexer import DicomHandler, INGEST_WORKERS, INGEST_BATCH_SIZE
+from app.services.journal import IngestJournal
+
+# Never move or consume files out of an archive
+DEFAULT_PLACEMENT = 'hardlink,reflink,copy'
+
+class RateLimiter:
+    """Spaces calls to wait() at most rate per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+        self.next_at = max(self.next_at, now) + self.interval
+
+def find_pending(root: str, journal: IngestJournal, known: Dict, threads: int) -> List[str]:
+    """New or changed files under root, walking top-level directories in parallel"""
+    subdirs = [entry.path for entry in os.scandir(root) if entry.is_dir(follow_symlinks=False)]
+    pending = list(journal.scan(root, known, recursive=False))
+
+    found = queue.Queue()
+
+    def scan(directory: str):
+        for file_path in journal.scan(directory, known):
+            found.put(file_path)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(scan, directory) for directory in subdirs]:
+            future.result()
+
+    while not found.empty():
+        pending.append(found.get_nowait())
+
+    return sorted(pending)
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+def feed(handler: DicomHandler, pending: List[str], limiter: RateLimiter, stop: threading.Event):
+    for file_path in pending:
+        if stop.is_set():
+            break
+        limiter.wait()
+        handler.enqueue(file_path)
+    # Ingest everything fed so far; an interrupt leaves the rest to a rerun
+    handler.stop(drain=not stop.is_set())
+
+def report(handler: DicomHandler, total: int, started: float):
+    elapsed = time.monotonic() - started
+    done = handler.files_done
+    rate = done / elapsed if elapsed else 0.0
+    eta = format_duration((total - done) / rate) if rate else '?'
+    print(f"{done}/{total} files ({done * 100 / total:.1f}%), {rate:.1f} files/s, ETA {eta}", flush=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill a DICOM archive into the NeoCXR index")
+    parser.add_argument('directory', help="Archive root to walk recursively")
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS, help="Header worker processes")
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE, help="Files per database transaction")
+    parser.add_argument('--scan-threads', type=int, default=8, help="Threads walking the directory tree")
+    parser.add_argument('--rate', type=float, default=0, help="Maximum files per second (0 = unlimited)")
+    parser.add_argument('--placement', default=DEFAULT_PLACEMENT, help="Store placement strategies, in order")
+    parser.add_argument('--progress-interval', type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would be ingested")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    root = os.path.abspath(args.directory)
+    if not os.path.isdir(root):
+        print(f"Not a directory: {root}", file=sys.stderr)
+        return 2
+
+    handler = DicomHandler(max_workers=args.workers, batch_size=args.batch_size, placement=args.placement)
+
+    db = SessionLocal()
+    try:
+        known = handler.journal.load(db)
+    finally:
+        db.close()
+
+    started = time.monotonic()
+    pending = find_pending(root, handler.journal, known, args.scan_threads)
+    total_bytes = sum(os.path.getsize(file_path) for file_path in pending)
+    print(
+        f"Found {len(pending)} new or changed files ({total_bytes / 1e9:.2f} GB) "
+        f"in {time.monotonic() - started:.1f}s; {len(known)} already journaled"
+    )
+
+    if args.dry_run or not pending:
+        return 0
+
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=handler.process_queue, daemon=True),
+        threading.Thread(target=handler.process_pixel_queue, daemon=True),
+        threading.Thread(target=feed, args=(handler, pending, RateLimiter(args.rate), stop), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    started = time.monotonic()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            threads[1].join(timeout=args.progress_interval)
+            report(handler, len(pending), started)
+    except KeyboardInterrupt:
+        # Let running batches commit so the journal reflects them
+        print("Interrupted; finishing in-flight batches...")
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
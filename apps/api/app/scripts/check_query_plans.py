@@ -0,0 +1,250 @@
+# apps/api/app/scripts/check_query_plans.py
+"""Query-plan regression check for the hot queries
+
+    python -m app.scripts.check_query_plans --database-url postgresql://.../neocxr_plans --tasks 200000
+
+Seeds an EMPTY scratch database with a synthetic queue, then checks
+that the /tasks/next, stats and export queries do not plan a
+sequential scan of tasks or annotations, use the index they were built
+for, and that their median latency stays within budget. Exits non-zero
+on any regression. Defaults to a throwaway SQLite file.
+
+Plans are taken from the statements as the application sends them,
+bound parameters included. tests/test_query_plans.py runs the plan
+checks on a small dataset; this script adds the latency budgets at a
+realistic size.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import create_engine, event, func, insert, or_, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.models.models import Annotation, OntologyClass, StatCounter, Study, Task, TaskStatus, User, UserRole
+from app.services.counters import COMPLETED_BY_DAY, day_key, rebuild
+from app.services.findings import distribution_query
+from app.services.task_queue import claim_candidates, queue_status
+from app.services.timeline import timeline_query, zone
+
+CHECKED_TABLES = ('tasks', 'annotations')
+# "SCAN <table>" (SQLite) or "Seq Scan on <table>" (PostgreSQL) without an index
+FULL_SCAN = re.compile(rf"^(SCAN|Seq Scan on) ({'|'.join(CHECKED_TABLES)})\b(?!.*USING)")
+# Share of seeded tasks per status
+STATUS_MIX = [
+    (TaskStatus.COMPLETED, 0.70),
+    (TaskStatus.QUEUED, 0.20),
+    (TaskStatus.LOCKED, 0.05),
+    (TaskStatus.NEEDS_REVIEW, 0.05),
+]
+SEED_CHUNK = 10000
+WARDS = ('NICU-1', 'NICU-2', 'NICU-3', 'PICU')
+
+def hot_queries(dialect_name: str) -> List[Tuple[str, object, float, Optional[str]]]:
+    """(name, statement, latency budget in ms, index it must use) for every query under check"""
+    now = datetime.utcnow()
+    today = now.date()
+    utc = zone('UTC')
+
+    return [
+        # /tasks/next
+        ('claim_queued', claim_candidates(dialect_name, TaskStatus.QUEUED, 5), 5, 'ix_tasks_queued_claim'),
+        ('claim_review', claim_candidates(dialect_name, TaskStatus.NEEDS_REVIEW, 5), 5, 'ix_tasks_review_claim'),
+        ('reaper_candidates', select(Task.id).where(
+            Task.status == queue_status(TaskStatus.LOCKED), Task.lock_expires_at < now
+        ), 20, 'ix_tasks_locked_expiry'),
+        # /stats/overview, from the counter rollup
+        ('stats_overview', select(StatCounter.name, StatCounter.scope, func.sum(StatCounter.value)).where(
+            or_(StatCounter.name != COMPLETED_BY_DAY, StatCounter.scope == day_key(now))
+        ).group_by(StatCounter.name, StatCounter.scope), 10, None),
+        # /stats/timeline
+        ('stats_timeline', timeline_query(dialect_name, utc, 'day', None, today - timedelta(days=6), today), 20,
+         'ix_tasks_status_updated_assignee'),
+        ('stats_timeline_users', timeline_query(dialect_name, utc, 'week', 'user', today - timedelta(days=90), today), 250,
+         'ix_tasks_status_updated_assignee'),
+        # /stats/pathology-distribution, from the finding rollup
+        ('stats_pathology', distribution_query(), 100, None),
+        ('stats_pathology_filtered', distribution_query(today - timedelta(days=30), today, ward='NICU-1', user_id=1), 20, None),
+        # Export: per-task annotations
+        ('export_annotations', select(Annotation).where(Annotation.task_id == 42), 5, 'ix_annotations_task_id'),
+    ]
+
+def seed(connection: Connection, task_count: int, annotations_per_task: int, rng: random.Random):
+    """Bulk-insert a synthetic dataset shaped like a busy deployment"""
+    now = datetime.utcnow()
+    connection.execute(insert(User), [
+        {'email': f'user{n}@example.org', 'password_hash': '-', 'role': UserRole.ANNOTATOR}
+        for n in range(50)
+    ])
+    connection.execute(insert(OntologyClass), [
+        {'name': f'class_{n}', 'kind': 'pathology' if n < 15 else 'device'} for n in range(20)
+    ])
+
+    statuses = [status for status, _ in STATUS_MIX]
+    weights = [weight for _, weight in STATUS_MIX]
+    for start in range(0, task_count, SEED_CHUNK):
+        ids = range(start + 1, min(start + SEED_CHUNK, task_count) + 1)
+        connection.execute(insert(Study), [
+            {'id': n, 'study_uid': f'1.2.826.0.1.{n}', 'meta_json': {'ward': rng.choice(WARDS)}} for n in ids
+        ])
+
+        tasks = []
+        for n in ids:
+            status = rng.choices(statuses, weights)[0]
+            created_at = now - timedelta(minutes=task_count - n)
+            tasks.append({
+                'id': n,
+                'study_id': n,
+                'status': status,
+                # Most cases are routine; a few are flagged urgent by policy
+                'priority': 100 if rng.random() < 0.02 else 0,
+                'assignee_id': None if status == TaskStatus.QUEUED else rng.randint(1, 50),
+                'lock_expires_at': now + timedelta(minutes=rng.randint(-2, 30)) if status == TaskStatus.LOCKED else None,
+                'created_at': created_at,
+                'updated_at': created_at + timedelta(minutes=rng.randint(0, 600)),
+            })
+        connection.execute(insert(Task), tasks)
+
+        connection.execute(insert(Annotation), [
+            {
+                'task_id': task['id'],
+                'user_id': task['assignee_id'],
+                'type': rng.choice(('scribble', 'polyline', 'mask')),
+                'class_id': rng.randint(1, 20),
+                'polarity': rng.choice(('pos', 'neg')),
+                'created_at': task['updated_at'],
+            }
+            for task in tasks if task['status'] == TaskStatus.COMPLETED
+            for _ in range(annotations_per_task)
+        ])
+
+def explain(connection: Connection, statement) -> List[str]:
+    """Plan steps of statement, executed with its bound parameters as the application would"""
+    postgresql = connection.dialect.name == 'postgresql'
+    prefix = 'EXPLAIN (FORMAT JSON) ' if postgresql else 'EXPLAIN QUERY PLAN '
+    rows = []
+
+    def explain_instead(conn, cursor, sql, parameters, context, executemany):
+        return prefix + sql, parameters
+
+    def fetch_plan(conn, cursor, sql, parameters, context, executemany):
+        rows.extend(cursor.fetchall())
+
+    event.listen(connection, 'before_cursor_execute', explain_instead, retval=True)
+    event.listen(connection, 'after_cursor_execute', fetch_plan)
+    try:
+        connection.execute(statement).close()
+    finally:
+        event.remove(connection, 'before_cursor_execute', explain_instead)
+        event.remove(connection, 'after_cursor_execute', fetch_plan)
+
+    if not postgresql:
+        return [row[-1] for row in rows]
+
+    plan = rows[0][0]
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    steps = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        step = node['Node Type']
+        if node.get('Relation Name'):
+            step += f" on {node['Relation Name']}"
+        if node.get('Index Name'):
+            step += f" USING {node['Index Name']}"
+        steps.append(step)
+        nodes.extend(node.get('Plans', []))
+    return steps
+
+def plan_problems(steps: List[str], index: Optional[str] = None) -> List[str]:
+    """Full scans of a checked table, and the expected index if the plan does not use it"""
+    problems = [step for step in steps if FULL_SCAN.match(step)]
+    if index is not None and not any(re.search(rf"\b{index}\b", step) for step in steps):
+        problems.append(f"not using {index}")
+    return problems
+
+def median_ms(connection: Connection, statement, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        connection.execute(statement).all()
+        timings.append((time.perf_counter() - started) * 1000)
+        # Drops the row locks taken by the FOR UPDATE claim checks
+        connection.rollback()
+    return statistics.median(timings)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help="empty scratch database (default: temporary SQLite file)")
+    parser.add_argument('--tasks', type=int, default=100000, help="tasks to seed")
+    parser.add_argument('--annotations-per-task', type=int, default=3)
+    parser.add_argument('--runs', type=int, default=5, help="timed runs per query")
+    parser.add_argument('--budget-scale', type=float, default=1.0, help="multiply every latency budget")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    tmp_dir = None
+    url = args.database_url
+    if url is None:
+        tmp_dir = tempfile.mkdtemp(prefix='neocxr-plans-')
+        url = f"sqlite:///{os.path.join(tmp_dir, 'plans.db')}"
+
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+
+    with engine.connect() as connection:
+        if connection.execute(select(func.count()).select_from(Task)).scalar():
+            print("Refusing to seed a database that already has tasks; use an empty scratch database", file=sys.stderr)
+            return 2
+
+        started = time.monotonic()
+        seed(connection, args.tasks, args.annotations_per_task, random.Random(args.seed))
+        connection.commit()
+        print(f"Seeded {args.tasks} tasks in {time.monotonic() - started:.1f}s")
+
+    with Session(engine) as db:
+        rebuild(db)
+
+    # Planner statistics; VACUUM also lets PostgreSQL use index-only scans
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('VACUUM ANALYZE' if engine.dialect.name == 'postgresql' else 'ANALYZE'))
+
+    failures = []
+    with engine.connect() as connection:
+        for name, statement, budget_ms, index in hot_queries(engine.dialect.name):
+            problems = plan_problems(explain(connection, statement), index)
+            connection.rollback()
+            elapsed = median_ms(connection, statement, args.runs)
+            budget = budget_ms * args.budget_scale
+
+            if elapsed > budget:
+                problems.append(f"{elapsed:.1f}ms over {budget:.0f}ms budget")
+            print(f"{'FAIL' if problems else 'ok':4} {name:24} {elapsed:8.2f}ms  {'; '.join(problems)}")
+            if problems:
+                failures.append(name)
+
+    engine.dispose()
+    if tmp_dir is not None:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if failures:
+        print(f"{len(failures)} query plan regressions: {', '.join(failures)}", file=sys.stderr)
+        return 1
+    print("All query plans use indexes and are within budget")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,15 @@
+# apps/api/app/scripts/migrate_indexes.py
+"""Create indexes declared in the models that an existing database lacks
+
+    python -m app.scripts.migrate_indexes [--dry-run]
+
+Kept for deployments that run it; app.scripts.migrate_schema now does the
+same and also adds missing columns and applies the follow-up index
+migrations, so this is an alias for it.
+"""
+import sys
+
+from app.scripts.migrate_schema import main
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,109 @@
+# apps/api/app/scripts/migrate_schema.py
+"""Add columns and indexes declared in the models that an existing database lacks
+
+    python -m app.scripts.migrate_schema [--dry-run]
+
+create_all() on startup only creates missing tables, so columns and
+indexes added to existing tables need this once per deployment. New
+columns must be nullable or carry a server default. On PostgreSQL
+indexes are built CONCURRENTLY, so the tables stay writable.
+"""
+import argparse
+import sys
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+
+from app.core.database import Base, engine
+import app.models.models  # noqa: F401  registers the tables on Base
+
+# Follow-up migrations to the index set first built by migrate_indexes,
+# in the order they shipped: retired index -> (table, index replacing it)
+RETIRED_INDEXES = {
+    # Claim order now includes priority
+    'ix_tasks_queued_created': ('tasks', 'ix_tasks_queued_claim'),
+    # Per-annotator timelines read the assignee from the index
+    'ix_tasks_status_updated': ('tasks', 'ix_tasks_status_updated_assignee'),
+}
+
+def retired_indexes(connection, building=()):
+    """Retired indexes still present whose replacement exists or is in building"""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    existing = {}
+    for index_name, (table_name, replacement) in RETIRED_INDEXES.items():
+        if table_name not in existing_tables:
+            continue
+        if table_name not in existing:
+            existing[table_name] = {index['name'] for index in inspector.get_indexes(table_name)}
+        # Never leave a query without its index, e.g. when a build failed
+        if index_name in existing[table_name] and (replacement in existing[table_name] or replacement in building):
+            yield index_name
+
+def missing_columns(connection):
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                yield column
+
+def missing_indexes(connection):
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            # create_all() builds new tables together with their indexes
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                yield index
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help="print the DDL without running it")
+    return parser.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    concurrently = engine.dialect.name == 'postgresql'
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        columns = list(missing_columns(connection))
+        for column in columns:
+            ddl = f"ALTER TABLE {column.table.name} ADD COLUMN {CreateColumn(column).compile(dialect=engine.dialect)}"
+            print(f"{ddl};")
+            if not args.dry_run:
+                connection.execute(text(ddl))
+
+        # Partial indexes may refer to the columns just added
+        indexes = list(missing_indexes(connection))
+        for index in indexes:
+            if concurrently:
+                index.dialect_options['postgresql']['concurrently'] = True
+            print(f"{CreateIndex(index).compile(dialect=engine.dialect)};")
+            if not args.dry_run:
+                index.create(connection)
+
+        retired = list(retired_indexes(connection, {index.name for index in indexes}))
+        for index_name in retired:
+            ddl = f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}{index_name}"
+            print(f"{ddl};")
+            if not args.dry_run:
+                connection.execute(text(ddl))
+
+    if not columns and not indexes and not retired:
+        print("Schema up to date")
+        return 0
+
+    print(f"{'Would add' if args.dry_run else 'Added'} {len(columns)} columns and {len(indexes)} indexes; "
+          f"{'would drop' if args.dry_run else 'dropped'} {len(retired)} retired indexes")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,33 @@
+# apps/api/app/scripts/rebuild_counters.py
+"""Recompute the dashboard counter rollup from the source tables
+
+    python -m app.scripts.rebuild_counters
+
+The API keeps the rollup current on its own, including changes made
+through the ORM, and builds it on first start-up. Raw SQL edits to
+studies, tasks or annotations are not seen; run this after them. Writes that land during the rebuild may be lost, so run it
+while the queue is quiet.
+"""
+import argparse
+import sys
+import time
+
+from app.core.database import Base, SessionLocal, engine
+from app.services.counters import rebuild
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        started = time.monotonic()
+        rebuild(db)
+    finally:
+        db.close()
+    print(f"Rebuilt dashboard counters in {time.monotonic() - started:.1f}s")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,49 @@
+# apps/api/app/services/bulk.py
+from typing import List, Dict
+from sqlalchemy.orm import Session
+
+def dialect_insert(db: Session, model):
+    """INSERT construct supporting ON CONFLICT for the bound database"""
+    dialect = db.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Unsupported database dialect: {dialect}")
+
+    return insert(model)
+
+def insert_ignore(db: Session, model, rows: List[Dict], key: str) -> Dict[str, int]:
+    """Bulk insert rows, skipping conflicts on a unique key
+
+    Returns {key value: id} for the rows this call actually inserted.
+    """
+    if not rows:
+        return {}
+
+    # ON CONFLICT cannot touch the same key twice in one statement
+    unique_rows = list({row[key]: row for row in rows}.values())
+
+    key_column = getattr(model, key)
+    stmt = dialect_insert(db, model).on_conflict_do_nothing(
+        index_elements=[key]
+    ).returning(model.id, key_column)
+
+    return {value: row_id for row_id, value in db.execute(stmt, unique_rows).all()}
+
+def upsert(db: Session, model, rows: List[Dict], key: str):
+    """Bulk insert rows, overwriting the other columns on key conflicts"""
+    if not rows:
+        return
+
+    unique_rows = list({row[key]: row for row in rows}.values())
+
+    stmt = dialect_insert(db, model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={column: stmt.excluded[column] for column in unique_rows[0] if column != key}
+    )
+
+    db.execute(stmt, unique_rows)
@@ -0,0 +1,390 @@
+# apps/api/app/services/counters.py
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import and_, case, cast, Date, delete, event, func, insert, inspect, or_, select, String
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Annotation, FindingCount, StatCounter, Study, Task, TaskStatus
+from app.services.bulk import dialect_insert
+from app.services.events import broker
+from app.services.findings import bump_findings, finding_deltas, rebuild_findings
+
+# Seconds the overview may lag behind the rollup
+COUNTERS_CACHE_TTL = getattr(settings, 'COUNTERS_CACHE_TTL', 5)
+# Rows per counter; more shards mean less lock contention between writers
+COUNTER_SHARDS = getattr(settings, 'COUNTER_SHARDS', 8)
+
+def _server_zone() -> str:
+    """IANA name of the server's own zone, from TZ or /etc/localtime; UTC if unknown"""
+    name = os.environ.get('TZ', '').lstrip(':')
+    if not name and os.path.islink('/etc/localtime'):
+        name = os.path.realpath('/etc/localtime').partition('/zoneinfo/')[2]
+    try:
+        return ZoneInfo(name).key if name else 'UTC'
+    except (ZoneInfoNotFoundError, ValueError):
+        return 'UTC'
+
+# Zone whose midnights split stats days: today_done, the per-day
+# counters and the timeline's default buckets
+STATS_TIMEZONE = getattr(settings, 'STATS_TIMEZONE', None) or _server_zone()
+
+# Counter names; the scope narrows a counter down
+STUDIES = 'studies'
+TASKS = 'tasks'                            # scope: task status
+COMPLETED_BY_USER = 'completed_by_user'    # scope: user id
+COMPLETED_BY_DAY = 'completed_by_day'      # scope: day in STATS_TIMEZONE, YYYY-MM-DD
+POSITIVE_FINDINGS = 'positive_findings'    # scope: ontology class id
+
+# Committed counter changes are published on this topic as [name, scope, delta] lists
+COUNTERS_TOPIC = 'counters'
+PENDING_DELTAS = 'counter_deltas'
+
+Deltas = Dict[Tuple[str, str], int]
+
+def day_key(at: datetime) -> str:
+    """Day in STATS_TIMEZONE of a naive UTC timestamp"""
+    return at.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(STATS_TIMEZONE)).date().isoformat()
+
+def _local_day(column, dialect_name: str):
+    """SQL for day_key of a timestamp column"""
+    if dialect_name == 'postgresql':
+        return cast(cast(func.timezone(STATS_TIMEZONE, func.timezone('UTC', column)), Date), String)
+    # SQLite has no zone database; shift by the zone's current UTC offset
+    offset = datetime.now(ZoneInfo(STATS_TIMEZONE)).utcoffset()
+    return cast(func.date(column, f'{int(offset.total_seconds() // 60):+d} minutes'), String)
+
+def bump(db: Session, deltas: Deltas):
+    """Add deltas to the rollup inside the caller's transaction
+
+    The counters commit or roll back together with the state change they
+    describe, so they never drift from the tables they summarise.
+    """
+    shard = random.randrange(COUNTER_SHARDS)
+    # Sorted, so concurrent transactions lock rows in the same order
+    rows = [
+        {'name': name, 'scope': scope, 'shard': shard, 'value': value}
+        for (name, scope), value in sorted(deltas.items()) if value
+    ]
+    if not rows:
+        return
+
+    # Published once the transaction commits
+    db.info.setdefault(PENDING_DELTAS, []).append(deltas)
+
+    stmt = dialect_insert(db, StatCounter)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['name', 'scope', 'shard'],
+        set_={'value': StatCounter.value + stmt.excluded.value}
+    )
+    db.execute(stmt, rows)
+
+def task_deltas(old: TaskStatus, new: TaskStatus, assignee_id: int = None,
+                at: datetime = None, count: int = 1) -> Deltas:
+    """Counter changes for count tasks moving from one status to another"""
+    if old == new or not count:
+        return {}
+    deltas = {(TASKS, old.value): -count, (TASKS, new.value): count}
+    if new == TaskStatus.COMPLETED:
+        deltas[(COMPLETED_BY_DAY, day_key(at or datetime.utcnow()))] = count
+        if assignee_id is not None:
+            deltas[(COMPLETED_BY_USER, str(assignee_id))] = count
+    return deltas
+
+def task_row_deltas(sign: int, status: TaskStatus, assignee_id: int = None, at: datetime = None) -> Deltas:
+    """What one task row in a given state contributes to the counters, times sign"""
+    if status is None:
+        return {}
+    deltas = {(TASKS, status.value): sign}
+    if status == TaskStatus.COMPLETED:
+        deltas[(COMPLETED_BY_DAY, day_key(at or datetime.utcnow()))] = sign
+        if assignee_id is not None:
+            deltas[(COMPLETED_BY_USER, str(assignee_id))] = sign
+    return deltas
+
+def merge(*all_deltas: Deltas) -> Deltas:
+    merged = {}
+    for deltas in all_deltas:
+        for key, value in deltas.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+@event.listens_for(Session, 'after_commit')
+def _publish_deltas(session: Session):
+    """Tell live dashboards about the counter changes that just committed"""
+    pending = session.info.pop(PENDING_DELTAS, None)
+    if not pending:
+        return
+    changes = [[name, scope, value] for (name, scope), value in merge(*pending).items() if value]
+    if changes:
+        broker.publish(COUNTERS_TOPIC, changes)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_deltas(session: Session):
+    session.info.pop(PENDING_DELTAS, None)
+
+def _annotation_key(type_, polarity, class_id) -> Optional[Tuple[str, str]]:
+    if type_ == 'scribble' and polarity == 'pos' and class_id is not None:
+        return (POSITIVE_FINDINGS, str(class_id))
+    return None
+
+ANNOTATION_FIELDS = ('task_id', 'user_id', 'type', 'class_id', 'polarity', 'created_at')
+
+@event.listens_for(Session, 'before_flush')
+def _count_annotations(session: Session, flush_context, instances):
+    """Keep finding counters in step with every annotation write, whichever endpoint makes it"""
+    # (+1 or -1, annotation values) for every annotation added, removed or changed
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Annotation):
+            changes.append((1, {field: getattr(obj, field) for field in ANNOTATION_FIELDS}))
+
+    # Stored values, since an expired object's history lacks what it replaced
+    changed = {
+        obj.id: obj for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, Annotation) and obj.id is not None
+    }
+    if changed:
+        stored = session.execute(
+            select(Annotation.id, *[getattr(Annotation, field) for field in ANNOTATION_FIELDS])
+            .where(Annotation.id.in_(changed))
+        ).all()
+        for annotation_id, *values in stored:
+            changes.append((-1, dict(zip(ANNOTATION_FIELDS, values))))
+            obj = changed[annotation_id]
+            if obj not in session.deleted:
+                changes.append((1, {field: getattr(obj, field) for field in ANNOTATION_FIELDS}))
+
+    if not changes:
+        return
+
+    deltas = {}
+    for sign, row in changes:
+        key = _annotation_key(row['type'], row['polarity'], row['class_id'])
+        if key is not None:
+            deltas[key] = deltas.get(key, 0) + sign
+    if any(deltas.values()):
+        bump(session, deltas)
+    bump_findings(session, finding_deltas(session, changes))
+
+TASK_FIELDS = ('status', 'assignee_id', 'updated_at')
+
+@event.listens_for(Session, 'before_flush')
+def _count_tasks(session: Session, flush_context, instances):
+    """Keep study and task counters in step with ORM writes, whichever code makes them
+
+    Bulk statements (claims, the lock reaper, ingest) bypass the unit of
+    work and bump the counters themselves. Raw SQL edits do neither; run
+    app.scripts.rebuild_counters after them.
+    """
+    deltas = []
+    for obj in session.new:
+        if isinstance(obj, Study):
+            deltas.append({(STUDIES, ''): 1})
+        elif isinstance(obj, Task):
+            deltas.append(task_row_deltas(1, obj.status or TaskStatus.QUEUED, obj.assignee_id, obj.updated_at))
+
+    deleted = {obj.id: obj for obj in session.deleted if isinstance(obj, Task) and obj.id is not None}
+    deltas.extend({(STUDIES, ''): -1} for obj in session.deleted if isinstance(obj, Study))
+    # Any update restamps updated_at, which moves a completed task to today
+    changed = {
+        obj.id: obj for obj in session.dirty
+        if isinstance(obj, Task) and obj.id is not None and session.is_modified(obj) and (
+            inspect(obj).attrs.status.history.has_changes() or obj.status == TaskStatus.COMPLETED
+        )
+    }
+
+    if deleted or changed:
+        # Stored values, since an expired object's history lacks what it replaced
+        stored = session.execute(
+            select(Task.id, *[getattr(Task, field) for field in TASK_FIELDS])
+            .where(Task.id.in_(list(deleted) + list(changed)))
+        ).all()
+        for task_id, status, assignee_id, updated_at in stored:
+            deltas.append(task_row_deltas(-1, status, assignee_id, updated_at))
+            obj = changed.get(task_id)
+            if obj is not None:
+                # onupdate stamps the row unless the caller set updated_at
+                at = obj.updated_at if inspect(obj).attrs.updated_at.history.has_changes() else None
+                deltas.append(task_row_deltas(1, obj.status, obj.assignee_id, at))
+
+    deltas = merge(*deltas)
+    if any(deltas.values()):
+        bump(session, deltas)
+
+def overview_fallback(db: Session, user_id: int) -> Dict[str, int]:
+    """Overview straight from the source tables in a single conditional-aggregate scan"""
+    # Midnight in STATS_TIMEZONE, as the naive UTC timestamps the tables store
+    tz = ZoneInfo(STATS_TIMEZONE)
+    today_start = datetime.combine(datetime.now(tz).date(), datetime.min.time(), tzinfo=tz)
+    today_start = today_start.astimezone(timezone.utc).replace(tzinfo=None)
+    completed = Task.status == TaskStatus.COMPLETED
+
+    def count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    row = db.execute(select(
+        select(func.count()).select_from(Study).scalar_subquery(),
+        count_if(completed),
+        select(func.count(func.distinct(Annotation.class_id))).where(
+            and_(Annotation.polarity == 'pos', Annotation.type == 'scribble')
+        ).scalar_subquery(),
+        count_if(and_(completed, Task.assignee_id == user_id)),
+        count_if(Task.status == TaskStatus.QUEUED),
+        count_if(and_(completed, Task.updated_at >= today_start)),
+    ).select_from(Task)).one()
+
+    return dict(zip(('total', 'done', 'positive_vocab', 'done_by_me', 'queued', 'today_done'), map(int, row)))
+
+def rebuild(db: Session):
+    """Recompute the whole rollup from the source tables and commit
+
+    For first deployment and after data fixes made with raw SQL, which
+    the counters cannot see. Task totals come from one conditional-
+    aggregate pass; completions per user and per day are dated by the
+    tasks' last update, in STATS_TIMEZONE days.
+    The finding rollup is rebuilt in the same transaction.
+    """
+    statuses = list(TaskStatus)
+    totals = db.execute(select(
+        select(func.count()).select_from(Study).scalar_subquery(),
+        *[func.coalesce(func.sum(case((Task.status == status, 1), else_=0)), 0) for status in statuses]
+    ).select_from(Task)).one()
+
+    values = {(STUDIES, ''): totals[0]}
+    values.update({(TASKS, status.value): count for status, count in zip(statuses, totals[1:])})
+
+    completed = Task.status == TaskStatus.COMPLETED
+    values.update(
+        ((COMPLETED_BY_USER, str(user_id)), count)
+        for user_id, count in db.execute(
+            select(Task.assignee_id, func.count()).where(completed, Task.assignee_id.isnot(None)).group_by(Task.assignee_id)
+        )
+    )
+    day = _local_day(Task.updated_at, db.get_bind().dialect.name)
+    values.update(
+        ((COMPLETED_BY_DAY, str(completed_day)), count)
+        for completed_day, count in db.execute(
+            select(day, func.count()).where(completed, Task.updated_at.isnot(None)).group_by(day)
+        )
+    )
+    values.update(
+        ((POSITIVE_FINDINGS, str(class_id)), count)
+        for class_id, count in db.execute(
+            select(Annotation.class_id, func.count()).where(
+                and_(Annotation.type == 'scribble', Annotation.polarity == 'pos', Annotation.class_id.isnot(None))
+            ).group_by(Annotation.class_id)
+        )
+    )
+
+    rebuild_findings(db)
+    db.execute(delete(StatCounter))
+    # Plain INSERT: a concurrent rebuild fails on the unique key instead of doubling counts
+    db.execute(insert(StatCounter), [
+        {'name': name, 'scope': scope, 'shard': 0, 'value': int(value)}
+        for (name, scope), value in values.items()
+    ])
+    db.commit()
+    counter_cache.invalidate()
+
+def ensure_counters(db: Session):
+    """Build the rollups if this database has never had them"""
+    built = db.execute(select(StatCounter.id).where(StatCounter.name == STUDIES).limit(1)).first() is not None
+    # The finding rollup arrived later than the counters
+    if built and (
+        db.execute(select(FindingCount.id).limit(1)).first() is not None
+        or db.execute(select(Annotation.id).where(Annotation.polarity == 'pos').limit(1)).first() is None
+    ):
+        return
+    started = time.monotonic()
+    try:
+        rebuild(db)
+    except IntegrityError:
+        # Another API process built it first
+        db.rollback()
+        return
+    print(f"Built dashboard counters in {time.monotonic() - started:.1f}s")
+
+class CounterCache:
+    """Short-lived in-process copy of the rollup
+
+    One small grouped read per TTL serves every dashboard in the process.
+    Only today's per-day counter is loaded, so the read stays the same
+    size however much history the rollup holds.
+    """
+
+    def __init__(self, ttl: float = None):
+        self.ttl = COUNTERS_CACHE_TTL if ttl is None else ttl
+        self._values: Optional[Dict[Tuple[str, str], int]] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+
+    def snapshot(self, db: Session, fresh: bool = False) -> Dict[Tuple[str, str], int]:
+        """Counter values by (name, scope); empty if the rollup was never built"""
+        with self._lock:
+            if not fresh and self._values is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._values
+
+        today = day_key(datetime.utcnow())
+        rows = db.execute(
+            select(StatCounter.name, StatCounter.scope, func.sum(StatCounter.value))
+            .where(or_(StatCounter.name != COMPLETED_BY_DAY, StatCounter.scope == today))
+            .group_by(StatCounter.name, StatCounter.scope)
+        ).all()
+        values = {(name, scope): int(value) for name, scope, value in rows}
+
+        with self._lock:
+            self._values = values
+            self._loaded_at = time.monotonic()
+        return values
+
+counter_cache = CounterCache()
+
+def positive_vocab(values: Dict[Tuple[str, str], int]) -> int:
+    """Number of classes with at least one positive finding"""
+    return sum(1 for (name, _), value in values.items() if name == POSITIVE_FINDINGS and value > 0)
+
+def overview(db: Session, user_id: int, fresh: bool = False) -> Dict[str, int]:
+    """Dashboard totals from the cached rollup, independent of table sizes"""
+    values = counter_cache.snapshot(db, fresh)
+    if not values:
+        return overview_fallback(db, user_id)
+
+    return {
+        'total': values.get((STUDIES, ''), 0),
+        'done': values.get((TASKS, TaskStatus.COMPLETED.value), 0),
+        'positive_vocab': positive_vocab(values),
+        'done_by_me': values.get((COMPLETED_BY_USER, str(user_id)), 0),
+        'queued': values.get((TASKS, TaskStatus.QUEUED.value), 0),
+        'today_done': values.get((COMPLETED_BY_DAY, day_key(datetime.utcnow())), 0),
+    }
+
+def overview_deltas(deltas: Deltas, user_id: int) -> Dict[str, int]:
+    """Changes to one user's overview fields implied by counter deltas
+
+    positive_vocab is a distinct count and cannot be derived from deltas.
+    """
+    fields = {
+        (STUDIES, ''): 'total',
+        (TASKS, TaskStatus.COMPLETED.value): 'done',
+        (COMPLETED_BY_USER, str(user_id)): 'done_by_me',
+        (TASKS, TaskStatus.QUEUED.value): 'queued',
+        (COMPLETED_BY_DAY, day_key(datetime.utcnow())): 'today_done',
+    }
+    changes = {}
+    for key, value in deltas.items():
+        field = fields.get(key)
+        if field is not None and value:
+            changes[field] = changes.get(field, 0) + value
+    return changes
\ No newline at end of file
@@ -0,0 +1,180 @@
+# apps/api/app/services/events.py
+import asyncio
+import json
+import threading
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+# 'redis' fans events out to every API process; 'memory' stays within this one
+EVENTS_BACKEND = getattr(settings, 'EVENTS_BACKEND', 'redis' if getattr(settings, 'REDIS_URL', None) else 'memory')
+EVENTS_CHANNEL_PREFIX = 'neocxr:events:'
+# Undelivered events a slow subscriber may fall behind by
+SUBSCRIBER_QUEUE_SIZE = getattr(settings, 'SUBSCRIBER_QUEUE_SIZE', 256)
+
+class Subscription:
+    """Events of one topic, delivered to an asyncio consumer
+
+    publish() may be called from any thread; events are handed to the
+    subscriber's event loop. A subscriber that falls too far behind
+    loses events and is marked as overflowed instead of blocking the
+    publisher.
+    """
+
+    def __init__(self, topic: str, loop: asyncio.AbstractEventLoop, maxsize: int = None):
+        self.topic = topic
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize or SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def _put(self, data):
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def deliver(self, data):
+        try:
+            self.loop.call_soon_threadsafe(self._put, data)
+        except RuntimeError:
+            # The subscriber's loop has closed
+            pass
+
+    async def get(self):
+        return await self.queue.get()
+
+    def get_nowait(self):
+        return self.queue.get_nowait()
+
+class MemoryBroker:
+    """In-process pub/sub for single-process deployments"""
+
+    def __init__(self):
+        self._subscriptions: Set[Subscription] = set()
+        self._callbacks: Dict[str, List[Callable]] = {}
+        self._lock = threading.Lock()
+        # Events kept back for another process to publish; see hold()
+        self._held: Optional[List[Tuple[str, object]]] = None
+
+    def publish(self, topic: str, data):
+        if self._held is not None:
+            with self._lock:
+                self._held.append((topic, data))
+            return
+        self._send(topic, data)
+
+    def _send(self, topic: str, data):
+        self._fan_out(topic, data)
+
+    def hold(self):
+        """Keep published events until drained, for pool workers whose parent forwards them"""
+        self._held = []
+
+    def drain_held(self) -> List[Tuple[str, object]]:
+        with self._lock:
+            if self._held is None:
+                return []
+            held, self._held = self._held, []
+        return held
+
+    def _fan_out(self, topic: str, data):
+        with self._lock:
+            subscriptions = [subscription for subscription in self._subscriptions if subscription.topic == topic]
+            callbacks = list(self._callbacks.get(topic, ()))
+        for subscription in subscriptions:
+            subscription.deliver(data)
+        for callback in callbacks:
+            try:
+                callback(data)
+            except Exception as e:
+                print(f"Event callback error on {topic}: {e}")
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Subscribe the running event loop to topic"""
+        subscription = Subscription(topic, asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def on(self, topic: str, callback: Callable):
+        """Call callback(data) for every event on topic, on whichever thread delivers it"""
+        with self._lock:
+            self._callbacks.setdefault(topic, []).append(callback)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def stop(self):
+        pass
+
+class RedisBroker(MemoryBroker):
+    """Pub/sub over Redis channels, so events reach subscribers in every API process
+
+    Events are published to Redis only; a listener thread receives them,
+    including this process's own, and fans them out locally.
+    """
+
+    def __init__(self, url: str = None):
+        import redis
+
+        super().__init__()
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _send(self, topic: str, data):
+        try:
+            self.client.publish(EVENTS_CHANNEL_PREFIX + topic, json.dumps(data))
+        except Exception as e:
+            # Live updates are best effort; the change itself is already committed
+            print(f"Event publish error: {e}")
+
+    def _start_listener(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+            self._thread.start()
+
+    def subscribe(self, topic: str) -> Subscription:
+        self._start_listener()
+        return super().subscribe(topic)
+
+    def on(self, topic: str, callback: Callable):
+        self._start_listener()
+        super().on(topic, callback)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(EVENTS_CHANNEL_PREFIX + '*')
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None:
+                        continue
+                    channel = message['channel'].decode()
+                    self._fan_out(channel[len(EVENTS_CHANNEL_PREFIX):], json.loads(message['data']))
+            except Exception as e:
+                print(f"Event listener error: {e}")
+                self._stop.wait(1.0)
+            finally:
+                pubsub.close()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+def create_broker(backend: str = None):
+    backend = backend or EVENTS_BACKEND
+    if backend == 'redis':
+        return RedisBroker()
+    if backend == 'memory':
+        return MemoryBroker()
+    raise ValueError(f"Unknown events backend: {backend}")
+
+broker = create_broker()
\ No newline at end of file
@@ -10,12 +10,17 @@ from sqlalchemy.orm import Session
 
 from app.models.models import Task, Annotation, Study, Instance
 from app.core.config import settings
+from app.services.ontology import ontology_registry
+from app.services.pixel_cache import pixel_cache
+from app.services.rendering import render_frame
 
 class ExportService:
     def __init__(self, db: Session):
         self.db = db
         self.export_dir = Path(settings.EXPORT_DIR)
         self.export_dir.mkdir(exist_ok=True)
+        # Class names by id without a query per annotation
+        self.ontology = ontology_registry.snapshot(db)
     
     def create_export(
         self,
@@ -129,7 +134,7 @@ class ExportService:
                     doc['annotations'].append({
                         'id': ann.id,
                         'type': ann.type,
-                        'class_name': ann.ontology_class.name,
+                        'class_name': self.ontology.name(ann.class_id),
                         'class_id': ann.class_id,
                         'polarity': ann.polarity,
                         'payload': ann.payload_json,
@@ -158,11 +163,10 @@ class ExportService:
                 study = task.study
                 instance = study.instances[0]  # Assume single instance per study
                 
-                # Copy original image
-                import shutil
+                # Render first frame from the decoded pixel cache
                 image_name = f"{study.study_uid}.png"
-                # Convert DICOM to PNG if needed
-                # ... conversion logic ...
+                ds, pixels = pixel_cache.frame(instance.id, instance.path_abs, 0)
+                Image.fromarray(render_frame(ds, pixels)).save(images_dir / image_name)
                 
                 # Generate mask from annotations
                 annotations = self.db.query(Annotation).filter(
@@ -177,7 +181,7 @@ class ExportService:
                     'study_uid': study.study_uid,
                     'image': f"images/{image_name}",
                     'mask': f"masks/{study.study_uid}_mask.png",
-                    'classes': list(set(ann.ontology_class.name for ann in annotations))
+                    'classes': list(set(self.ontology.name(ann.class_id) for ann in annotations))
                 })
             
             # Write metadata
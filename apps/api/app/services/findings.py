@@ -0,0 +1,134 @@
+# apps/api/app/services/findings.py
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import cast, delete, func, insert, select, String
+from sqlalchemy.orm import Session
+
+from app.models.models import Annotation, FindingCount, Study, Task
+from app.services.bulk import dialect_insert
+
+# (day, class id, user id, ward, kind)
+FindingKey = Tuple[date, int, int, str, str]
+
+def _ward(meta_json) -> str:
+    return str((meta_json or {}).get('ward') or '')
+
+def finding_deltas(db: Session, changes: Iterable[Tuple[int, dict]]) -> Dict[FindingKey, int]:
+    """Rollup changes for (sign, annotation values) pairs; only positive findings count"""
+    changes = [
+        (sign, row) for sign, row in changes
+        if row['polarity'] == 'pos' and row['class_id'] is not None
+    ]
+    if not changes:
+        return {}
+
+    # Ward of every task involved, in one query
+    task_ids = {row['task_id'] for _, row in changes}
+    wards = {
+        task_id: _ward(meta_json)
+        for task_id, meta_json in db.execute(
+            select(Task.id, Study.meta_json).join(Study, Study.id == Task.study_id).where(Task.id.in_(task_ids))
+        )
+    }
+
+    deltas = {}
+    for sign, row in changes:
+        key = (
+            (row['created_at'] or datetime.utcnow()).date(),
+            row['class_id'],
+            row['user_id'] or 0,
+            wards.get(row['task_id'], ''),
+            row['type'] or '',
+        )
+        deltas[key] = deltas.get(key, 0) + sign
+    return deltas
+
+def bump_findings(db: Session, deltas: Dict[FindingKey, int]):
+    """Add deltas to the finding rollup inside the caller's transaction"""
+    rows = [
+        {'day': day, 'class_id': class_id, 'user_id': user_id, 'ward': ward, 'kind': kind, 'value': value}
+        for (day, class_id, user_id, ward, kind), value in sorted(deltas.items()) if value
+    ]
+    if not rows:
+        return
+
+    stmt = dialect_insert(db, FindingCount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['day', 'class_id', 'user_id', 'ward', 'kind'],
+        set_={'value': FindingCount.value + stmt.excluded.value}
+    )
+    db.execute(stmt, rows)
+
+def rebuild_findings(db: Session):
+    """Replace the finding rollup with counts from the annotations table; the caller commits"""
+    day = cast(func.date(Annotation.created_at), String)
+    ward = Study.meta_json['ward'].as_string()
+    grouped = db.execute(
+        select(day, Annotation.class_id, Annotation.user_id, ward, Annotation.type, func.count())
+        .outerjoin(Task, Task.id == Annotation.task_id)
+        .outerjoin(Study, Study.id == Task.study_id)
+        .where(Annotation.polarity == 'pos', Annotation.class_id.isnot(None), Annotation.created_at.isnot(None))
+        .group_by(day, Annotation.class_id, Annotation.user_id, ward, Annotation.type)
+    ).all()
+
+    # Unknown annotators and wards fold into one key each
+    values = {}
+    for created_day, class_id, user_id, ward_name, kind, count in grouped:
+        key = (date.fromisoformat(str(created_day)[:10]), class_id, user_id or 0, ward_name or '', kind or '')
+        values[key] = values.get(key, 0) + count
+
+    db.execute(delete(FindingCount))
+    if values:
+        db.execute(insert(FindingCount), [
+            {'day': key[0], 'class_id': key[1], 'user_id': key[2], 'ward': key[3], 'kind': key[4], 'value': value}
+            for key, value in values.items()
+        ])
+
+def distribution_query(start: Optional[date] = None, end: Optional[date] = None,
+                       ward: Optional[str] = None, user_id: Optional[int] = None,
+                       kind: Optional[str] = 'scribble'):
+    """Rollup totals per ontology class id"""
+    conditions = []
+    if start is not None:
+        conditions.append(FindingCount.day >= start)
+    if end is not None:
+        conditions.append(FindingCount.day <= end)
+    if ward is not None:
+        conditions.append(FindingCount.ward == ward)
+    if user_id is not None:
+        conditions.append(FindingCount.user_id == user_id)
+    if kind is not None:
+        conditions.append(FindingCount.kind == kind)
+
+    total = func.sum(FindingCount.value).label('count')
+    return (
+        select(FindingCount.class_id, total)
+        .where(*conditions)
+        .group_by(FindingCount.class_id)
+        .having(total > 0)
+        .order_by(total.desc(), FindingCount.class_id)
+    )
+
+def pathology_distribution(db: Session, ontology, start: Optional[date] = None, end: Optional[date] = None,
+                           ward: Optional[str] = None, user_id: Optional[int] = None,
+                           kind: Optional[str] = 'scribble') -> List[dict]:
+    """Positive finding counts per ontology class from the rollup, in one query
+
+    Class names and colours come from the ontology snapshot. start and
+    end are inclusive UTC days. Classes without findings in the
+    selection, or no longer in the ontology, are left out.
+    """
+    distribution = []
+    for class_id, count in db.execute(distribution_query(start, end, ward, user_id, kind)):
+        entry = ontology.get(class_id)
+        if entry is None:
+            continue
+        distribution.append({
+            'id': class_id,
+            'name': entry.name_tr or entry.name,
+            'kind': entry.kind,
+            'count': int(count),
+            'color': entry.color
+        })
+    return distribution
@@ -0,0 +1,148 @@
+# apps/api/app/services/frames.py
+import struct
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+import pydicom
+from pydicom.uid import DeflatedExplicitVRLittleEndian, ExplicitVRBigEndian
+
+from app.services.store import source_version
+
+PIXEL_DATA_TAG = 0x7FE00010
+ITEM_TAG = 0xFFFEE000
+SEQUENCE_DELIMITER_TAG = 0xFFFEE0DD
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
+# Media types for frames served in their stored encoding
+MEDIA_TYPES = {
+    '1.2.840.10008.1.2.4.50': 'image/jpeg',
+    '1.2.840.10008.1.2.4.51': 'image/jpeg',
+    '1.2.840.10008.1.2.4.57': 'image/jpeg',
+    '1.2.840.10008.1.2.4.70': 'image/jpeg',
+    '1.2.840.10008.1.2.4.80': 'image/jls',
+    '1.2.840.10008.1.2.4.81': 'image/jls',
+    '1.2.840.10008.1.2.4.90': 'image/jp2',
+    '1.2.840.10008.1.2.4.91': 'image/jp2',
+    '1.2.840.10008.1.2.4.201': 'image/jphc',
+    '1.2.840.10008.1.2.4.202': 'image/jphc',
+    '1.2.840.10008.1.2.5': 'image/dicom-rle',
+}
+
+# First bytes of a JPEG or JPEG 2000 codestream mark a new frame
+FRAME_START_MARKERS = (b'\xff\xd8', b'\xff\x4f\xff\x51')
+
+class FrameIndexError(ValueError):
+    """The file's frames cannot be located without decoding it"""
+
+def _read_tag(f, endian: str) -> Tuple[int, int]:
+    group, element, length = struct.unpack(f'{endian}HHL', f.read(8))
+    return (group << 16) | element, length
+
+@lru_cache(maxsize=1024)
+def _frame_index(path: str, version: str) -> Dict:
+    with open(path, 'rb') as f:
+        # Leaves the file positioned at the Pixel Data element
+        ds = pydicom.dcmread(f, stop_before_pixels=True)
+        transfer_syntax = str(ds.file_meta.TransferSyntaxUID)
+
+        if transfer_syntax == DeflatedExplicitVRLittleEndian:
+            raise FrameIndexError("Deflated datasets have no stable byte offsets")
+
+        endian = '>' if transfer_syntax == ExplicitVRBigEndian else '<'
+        header = f.read(8)
+        if len(header) < 8:
+            raise FrameIndexError("No pixel data")
+
+        group, element = struct.unpack(f'{endian}HH', header[:4])
+        if (group << 16) | element != PIXEL_DATA_TAG:
+            raise FrameIndexError("No pixel data")
+
+        if ds.is_implicit_VR:
+            length, = struct.unpack(f'{endian}L', header[4:])
+        else:
+            # OB/OW: 2 reserved bytes, then a 4-byte length
+            length, = struct.unpack(f'{endian}L', f.read(4))
+
+        value_start = f.tell()
+        frame_count = int(getattr(ds, 'NumberOfFrames', 1) or 1)
+
+        if length != UNDEFINED_LENGTH:
+            bits_allocated = int(ds.BitsAllocated)
+            if bits_allocated % 8:
+                raise FrameIndexError("Bit-packed pixel data is not byte addressable")
+
+            frame_size = int(ds.Rows) * int(ds.Columns) * int(getattr(ds, 'SamplesPerPixel', 1)) * bits_allocated // 8
+            frames = [[(value_start + n * frame_size, frame_size)] for n in range(frame_count)]
+        else:
+            frames = _encapsulated_frames(f, endian, frame_count, ds)
+
+    return {
+        'transfer_syntax': transfer_syntax,
+        'encapsulated': length == UNDEFINED_LENGTH,
+        'frames': frames,
+    }
+
+def _encapsulated_frames(f, endian: str, frame_count: int, ds) -> List[List[Tuple[int, int]]]:
+    tag, bot_length = _read_tag(f, endian)
+    if tag != ITEM_TAG:
+        raise FrameIndexError("Malformed encapsulated pixel data")
+    offsets = list(struct.unpack(f'{endian}{bot_length // 4}L', f.read(bot_length)))
+
+    # Fragment index: (offset from first fragment item, data position, length)
+    first_item = f.tell()
+    fragments = []
+    while True:
+        position = f.tell()
+        tag, length = _read_tag(f, endian)
+        if tag == SEQUENCE_DELIMITER_TAG:
+            break
+        if tag != ITEM_TAG:
+            raise FrameIndexError("Malformed encapsulated pixel data")
+        fragments.append((position - first_item, position + 8, length))
+        f.seek(length, 1)
+
+    if not offsets and 'ExtendedOffsetTable' in ds:
+        table = ds.ExtendedOffsetTable
+        offsets = list(struct.unpack(f'{endian}{len(table) // 8}Q', table))
+
+    if offsets:
+        starts = set(offsets)
+    elif frame_count == 1:
+        starts = {0}
+    elif len(fragments) == frame_count:
+        starts = {fragment[0] for fragment in fragments}
+    else:
+        # No offset table: a codestream start marker opens each frame
+        starts = set()
+        for offset, data_position, _ in fragments:
+            f.seek(data_position)
+            if f.read(4).startswith(FRAME_START_MARKERS):
+                starts.add(offset)
+
+    frames = []
+    for offset, data_position, length in fragments:
+        if offset in starts or not frames:
+            frames.append([])
+        frames[-1].append((data_position, length))
+
+    if len(frames) != frame_count:
+        raise FrameIndexError("Could not match fragments to frames")
+    return frames
+
+def frame_index(path: str) -> Dict:
+    """Byte ranges of every frame in a stored file, cached per file version"""
+    return _frame_index(path, source_version(path))
+
+def read_frame(path: str, frame_number: int) -> Tuple[bytes, str, bool]:
+    """Stored bytes of a zero-based frame, its transfer syntax and whether it is encapsulated"""
+    index = frame_index(path)
+    if not 0 <= frame_number < len(index['frames']):
+        raise IndexError("Frame number out of range")
+
+    chunks = []
+    with open(path, 'rb') as f:
+        for position, length in index['frames'][frame_number]:
+            f.seek(position)
+            chunks.append(f.read(length))
+
+    return b''.join(chunks), index['transfer_syntax'], index['encapsulated']
@@ -0,0 +1,85 @@
+# apps/api/app/services/imaging_pool.py
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+from app.core.config import settings
+from app.services.metrics import counter, gauge, histogram
+
+# Threads decoding/rendering; NumPy, Pillow and the pixel codecs release the GIL
+IMAGING_THREADS = getattr(settings, 'IMAGING_THREADS', None) or min(4, os.cpu_count() or 1)
+# Jobs admitted at once (running + waiting for a thread); the rest wait outside
+IMAGING_MAX_PENDING = getattr(settings, 'IMAGING_MAX_PENDING', IMAGING_THREADS * 4)
+
+IMAGING_QUEUE_SECONDS = histogram(
+    'neocxr_imaging_queue_seconds', 'Time imaging jobs wait before a worker picks them up', ['op']
+)
+IMAGING_RUN_SECONDS = histogram(
+    'neocxr_imaging_run_seconds', 'Time imaging jobs spend running', ['op']
+)
+IMAGING_COALESCED = counter(
+    'neocxr_imaging_coalesced_total', 'Requests that joined an identical in-flight job', ['op']
+)
+IMAGING_IN_FLIGHT = gauge(
+    'neocxr_imaging_in_flight', 'Imaging jobs admitted or waiting for admission'
+)
+
+class ImagingPool:
+    """Bounded executor for blocking decode/render work called from async routes
+
+    Identical jobs (same key) that overlap share one execution, and at most
+    max_pending jobs are admitted to the thread pool at a time, so heavy
+    renders cannot starve the event loop or each other.
+    """
+
+    def __init__(self, max_workers: int = None, max_pending: int = None):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or IMAGING_THREADS,
+            thread_name_prefix='imaging'
+        )
+        self.max_pending = max_pending or IMAGING_MAX_PENDING
+        self._admission = None
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, op: str, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        """Run fn(*args) on the pool, sharing the result with concurrent callers of key"""
+        job_key = (op, key)
+        future = self._in_flight.get(job_key)
+        if future is not None:
+            IMAGING_COALESCED.inc(op=op)
+        else:
+            future = asyncio.ensure_future(self._execute(op, fn, args))
+            self._in_flight[job_key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(job_key, None))
+
+        # A disconnecting client must not cancel the job for everyone else
+        return await asyncio.shield(future)
+
+    async def _execute(self, op: str, fn: Callable[..., Any], args) -> Any:
+        if self._admission is None:
+            self._admission = asyncio.Semaphore(self.max_pending)
+
+        submitted = time.perf_counter()
+        IMAGING_IN_FLIGHT.inc()
+        try:
+            async with self._admission:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, self._timed, op, submitted, fn, args)
+        finally:
+            IMAGING_IN_FLIGHT.dec()
+
+    @staticmethod
+    def _timed(op: str, submitted: float, fn: Callable[..., Any], args) -> Any:
+        started = time.perf_counter()
+        IMAGING_QUEUE_SECONDS.observe(started - submitted, op=op)
+        try:
+            return fn(*args)
+        finally:
+            IMAGING_RUN_SECONDS.observe(time.perf_counter() - started, op=op)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+imaging_pool = ImagingPool()
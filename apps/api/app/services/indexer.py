@@ -1,166 +1,637 @@
 # apps/api/app/services/indexer.py
+import multiprocessing
 import os
+import queue
+import re
 import threading
 import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from pathlib import Path
 from datetime import datetime
 import pydicom
-from PIL import Image
-import numpy as np
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.database import SessionLocal
-from app.models.models import Study, Instance, Task
+from app.core.database import SessionLocal, engine
+from app.models.models import Study, Instance, Task, TaskStatus
+from app.services.bulk import insert_ignore
+from app.services.counters import bump, STUDIES, TASKS
+from app.services.events import broker
+from app.services.journal import IngestJournal, file_digest
+from app.services.metrics import counter, gauge, histogram, RateMeter
+from app.services.scheduler import scheduler
+from app.services.rendering import frame_pixels, render_frame
+from app.services.store import StorePlacer, source_version
+from app.services.thumbnails import write_thumbnails
+from app.services.tiles import tile_pyramid, TILES_AT_INGEST
+from app.services.transcode import Transcoder, decode_timed
+
+# Ingest pool sizing; override through settings
+INGEST_WORKERS = getattr(settings, 'INGEST_WORKERS', None) or os.cpu_count() or 1
+INGEST_QUEUE_SIZE = getattr(settings, 'INGEST_QUEUE_SIZE', 1000)
+INGEST_BATCH_SIZE = getattr(settings, 'INGEST_BATCH_SIZE', 100)
+PIXEL_WORKERS = getattr(settings, 'PIXEL_WORKERS', None) or max(1, INGEST_WORKERS // 2)
+PIXEL_NICE = getattr(settings, 'PIXEL_NICE', 10)
+# Pools start from a clean interpreter; forking would copy the watchdog,
+# rescan and server threads' locks in whatever state they were in
+INGEST_START_METHOD = getattr(settings, 'INGEST_START_METHOD', None) or (
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+# Seconds a blocked enqueue waits between checks for stop()
+ENQUEUE_POLL = 0.5
+# Seconds a file's size and mtime must hold still before it is ingested
+# without a close event, e.g. after a rename into the inbox or where the
+# observer cannot report closes
+INGEST_SETTLE_SECONDS = getattr(settings, 'INGEST_SETTLE_SECONDS', 2.0)
+# Seconds between retries of failed files that have changed since, in
+# case their change events were missed
+INGEST_RETRY_SECONDS = getattr(settings, 'INGEST_RETRY_SECONDS', 60)
+
+# Ingest telemetry; workers time their stages and the parent records them
+INGEST_STAGE_SECONDS = histogram(
+    'neocxr_ingest_stage_seconds', 'Time spent per ingest stage', ['stage']
+)
+INGEST_FILES = counter(
+    'neocxr_ingest_files_total', 'Files handled by the indexer', ['result']
+)
+INGEST_ERRORS = counter(
+    'neocxr_ingest_errors_total', 'Ingest failures by stage and exception type', ['stage', 'exception']
+)
+INGEST_QUEUE_DEPTH = gauge(
+    'neocxr_ingest_queue_depth', 'Items waiting in the ingest queues', ['queue']
+)
+INGEST_FILES_PER_SECOND = gauge(
+    'neocxr_ingest_files_per_second', 'Files indexed per second over the last minute'
+)
+INGEST_RATE = RateMeter(window=60.0)
+INGEST_FILES_PER_SECOND.set_function(INGEST_RATE.rate)
+
+# Per-process handler used by pool workers
+_worker_handler = None
+
+def _init_worker(placement=None):
+    """Initialize an ingest worker process"""
+    global _worker_handler
+    # Connections inherited from the parent must not be reused after fork;
+    # a no-op under spawn and forkserver
+    engine.dispose(close=False)
+    _worker_handler = DicomHandler(placement=placement)
+    # Subscribers live in the parent, which publishes on the worker's behalf
+    broker.hold()
+
+def _init_pixel_worker():
+    """Initialize a pixel worker process at lower CPU priority"""
+    _init_worker()
+    os.nice(PIXEL_NICE)
+
+def _process_in_worker(file_paths: list):
+    result = _worker_handler.process_batch(file_paths)
+    return result, _worker_handler.drain_timings(), broker.drain_held()
+
+def _render_in_worker(pixel_job: dict):
+    _worker_handler.process_pixels(pixel_job)
+    return _worker_handler.drain_timings(), broker.drain_held()
+
+def _record_timings(timings: dict):
+    for stage, durations in timings.items():
+        for duration in durations:
+            INGEST_STAGE_SECONDS.observe(duration, stage=stage)
+
+def _forward_events(events: list):
+    for topic, data in events:
+        broker.publish(topic, data)
 
 class DicomHandler(FileSystemEventHandler):
-    def __init__(self):
-        self.processing_queue = []
-        self.lock = threading.Lock()
+    def __init__(self, max_workers: int = None, queue_size: int = None, batch_size: int = None, placement=None):
+        self.max_workers = max_workers or INGEST_WORKERS
+        self.batch_size = batch_size or INGEST_BATCH_SIZE
+        # Bounded queue: producers block when ingest falls behind
+        self.processing_queue = queue.Queue(maxsize=queue_size or INGEST_QUEUE_SIZE)
+        # Pixel jobs are small dicts produced by already committed rows
+        self.pixel_queue = queue.Queue()
+        # Limit batches handed to each pool but not yet finished
+        self.slots = threading.BoundedSemaphore(self.max_workers * 2)
+        self.pixel_slots = threading.BoundedSemaphore(PIXEL_WORKERS * 2)
+        # Study UID -> id for studies known to be committed
+        self.study_cache = {}
+        self.journal = IngestJournal()
+        self.placement = placement
+        self.placer = StorePlacer(placement)
+        self.transcoder = Transcoder(dedup=self.placer.dedup)
+        # Stage name -> durations, drained by whoever records metrics
+        self.stage_timings = defaultdict(list)
+        # Files whose header batch has finished, successfully or not
+        self.files_done = 0
+        # Set by stop(); queued and not yet started work is then dropped
+        self.stopping = threading.Event()
+        # Path -> (size, mtime_ns) last seen, or None, for files that may
+        # still be being written; see settle()
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        
+        INGEST_QUEUE_DEPTH.set_function(self.processing_queue.qsize, queue='header')
+        INGEST_QUEUE_DEPTH.set_function(self.pixel_queue.qsize, queue='pixel')
         
     def on_created(self, event):
+        # The sender may still be writing; wait for the close or for it to settle
+        if not event.is_directory and event.src_path.endswith('.dcm'):
+            self._watch(event.src_path)
+    
+    def on_modified(self, event):
+        if not event.is_directory and event.src_path.endswith('.dcm'):
+            self._watch(event.src_path)
+    
+    def on_closed(self, event):
+        # Only reported for files closed after writing
         if not event.is_directory and event.src_path.endswith('.dcm'):
-            with self.lock:
-                self.processing_queue.append(event.src_path)
+            self._unwatch(event.src_path)
+            self.enqueue(event.src_path)
+    
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        self._unwatch(event.src_path)
+        # A rename is atomic, so the file is complete under its new name
+        if event.dest_path.endswith('.dcm'):
+            self.enqueue(event.dest_path)
+    
+    def _watch(self, file_path: str):
+        with self.pending_lock:
+            self.pending[file_path] = None
+    
+    def _unwatch(self, file_path: str):
+        with self.pending_lock:
+            self.pending.pop(file_path, None)
+    
+    def settle(self) -> int:
+        """Enqueue watched files that have not changed since the last call
+        
+        Called every INGEST_SETTLE_SECONDS. Catches files that arrive
+        without a close event; a file still being written changes between
+        calls and stays watched.
+        """
+        with self.pending_lock:
+            pending = dict(self.pending)
+        
+        ready = []
+        for file_path, seen in pending.items():
+            try:
+                st = os.stat(file_path)
+                current = (st.st_size, st.st_mtime_ns)
+            except OSError:
+                current = None
+            
+            with self.pending_lock:
+                # Written to or closed since the snapshot
+                if file_path not in self.pending or self.pending[file_path] != seen:
+                    continue
+                if current is None:
+                    del self.pending[file_path]
+                elif current == seen:
+                    del self.pending[file_path]
+                    ready.append(file_path)
+                else:
+                    self.pending[file_path] = current
+        
+        for file_path in ready:
+            if not self.enqueue(file_path):
+                break
+        return len(ready)
+    
+    def enqueue(self, file_path: str) -> bool:
+        """Queue a file for ingest, blocking while the queue is full
+        
+        Returns False once stop() has been called; the file is left to
+        the next rescan.
+        """
+        while not self.stopping.is_set():
+            try:
+                self.processing_queue.put(file_path, timeout=ENQUEUE_POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+    
+    def _pool(self, max_workers: int, initializer, initargs=()) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context(INGEST_START_METHOD),
+            initializer=initializer,
+            initargs=initargs
+        )
     
     def process_queue(self):
+        """Stage one: index headers until stop() is called"""
+        with self._pool(self.max_workers, _init_worker, (self.placement,)) as pool:
+            self._run_stage(self.processing_queue, pool, self.slots, _process_in_worker, self._on_processed, self.batch_size)
+        
+        # Every header batch has finished, so no more pixel jobs will arrive
+        if self.stopping.is_set():
+            self._discard(self.pixel_queue)
+        self.pixel_queue.put(None)
+    
+    def process_pixel_queue(self):
+        """Stage two: decode pixels and render thumbnails until stop() is called"""
+        with self._pool(PIXEL_WORKERS, _init_pixel_worker) as pool:
+            self._run_stage(self.pixel_queue, pool, self.pixel_slots, _render_in_worker, self._on_rendered)
+    
+    def _run_stage(self, work_queue: queue.Queue, pool, slots, fn, on_done, batch_size: int = None):
         while True:
-            files_to_process = []
-            with self.lock:
-                files_to_process = self.processing_queue[:]
-                self.processing_queue.clear()
-            
-            for file_path in files_to_process:
+            items = [work_queue.get()]
+            # Batch whatever else is already waiting, without waiting for more
+            while batch_size and len(items) < batch_size and items[-1] is not None:
                 try:
-                    self.process_dicom(file_path)
-                except Exception as e:
-                    print(f"Error processing {file_path}: {e}")
+                    items.append(work_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stopping = items[-1] is None
+            if stopping:
+                items.pop()
+                work_queue.task_done()
+            
+            if items and self.stopping.is_set():
+                for _ in items:
+                    work_queue.task_done()
+            elif items:
+                work = items if batch_size else items[0]
+                slots.acquire()
+                future = pool.submit(fn, work)
+                future.add_done_callback(partial(on_done, work))
             
-            time.sleep(2)  # Check every 2 seconds
+            if stopping:
+                if self.stopping.is_set():
+                    # Running batches still commit; the rest is never started
+                    pool.shutdown(wait=True, cancel_futures=True)
+                break
+    
+    def _discard(self, work_queue: queue.Queue):
+        while True:
+            try:
+                work_queue.get_nowait()
+            except queue.Empty:
+                return
+            work_queue.task_done()
+    
+    def _on_processed(self, file_paths: list, future):
+        self.slots.release()
+        for _ in file_paths:
+            self.processing_queue.task_done()
+        if future.cancelled():
+            return
+        self.files_done += len(file_paths)
+        
+        error = future.exception()
+        if error:
+            INGEST_ERRORS.inc(stage='batch', exception=type(error).__name__)
+            INGEST_FILES.inc(len(file_paths), result='failed')
+            print(f"Error processing batch of {len(file_paths)} files: {error}")
+            return
+        
+        (pixel_jobs, errors), timings, events = future.result()
+        _record_timings(timings)
+        _forward_events(events)
+        
+        for file_path, file_error in errors.items():
+            INGEST_ERRORS.inc(stage='header', exception=type(file_error).__name__)
+            print(f"Error processing {file_path}: {file_error}")
+        
+        INGEST_FILES.inc(len(pixel_jobs), result='indexed')
+        INGEST_FILES.inc(len(file_paths) - len(pixel_jobs) - len(errors), result='duplicate')
+        INGEST_FILES.inc(len(errors), result='failed')
+        INGEST_RATE.mark(len(file_paths) - len(errors))
+        
+        for pixel_job in pixel_jobs:
+            self.pixel_queue.put(pixel_job)
+    
+    def _on_rendered(self, pixel_job: dict, future):
+        self.pixel_slots.release()
+        self.pixel_queue.task_done()
+        if future.cancelled():
+            return
+        
+        error = future.exception()
+        if error:
+            INGEST_ERRORS.inc(stage='pixel', exception=type(error).__name__)
+            print(f"Error rendering {pixel_job['path']}: {error}")
+            return
+        
+        timings, events = future.result()
+        _record_timings(timings)
+        _forward_events(events)
+    
+    def stop(self, drain: bool = False):
+        """Stop both stages
+        
+        Batches already running finish and commit. Queued work is dropped
+        and left to the journal and the next rescan, unless drain is set,
+        in which case everything queued is ingested first. Producers must
+        have stopped enqueueing before this is called.
+        """
+        if not drain:
+            self.stopping.set()
+            self._discard(self.processing_queue)
+        self.processing_queue.put(None)
+    
+    def rescan(self, root: str) -> int:
+        """Enqueue files under root that the journal has not seen in this state"""
+        db = SessionLocal()
+        try:
+            known = self.journal.load(db)
+        finally:
+            db.close()
+        
+        queued = 0
+        for file_path in self.journal.scan(root, known):
+            if not self.enqueue(file_path):
+                break
+            queued += 1
+        
+        print(f"Rescan of {root} queued {queued} files ({len(known)} journaled)")
+        return queued
+    
+    def retry_failed(self) -> int:
+        """Enqueue files whose ingest failed and that have changed since, e.g. finished writing"""
+        db = SessionLocal()
+        try:
+            failed = self.journal.load(db, status='failed')
+        finally:
+            db.close()
+        
+        queued = 0
+        for file_path in self.journal.changed(failed):
+            with self.pending_lock:
+                # Still being written; settle() queues it when done
+                if file_path in self.pending:
+                    continue
+            if not self.enqueue(file_path):
+                break
+            queued += 1
+        
+        if queued:
+            print(f"Retrying {queued} of {len(failed)} failed files")
+        return queued
+    
+    @contextmanager
+    def _timed(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_timings[stage].append(time.perf_counter() - started)
+    
+    def drain_timings(self) -> dict:
+        """Return and reset the stage durations collected so far"""
+        timings, self.stage_timings = dict(self.stage_timings), defaultdict(list)
+        return timings
     
     def process_dicom(self, file_path: str):
+        """Index a single file and return the pending pixel job, if any"""
+        pixel_jobs, errors = self.process_batch([file_path])
+        if errors:
+            raise errors[file_path]
+        
+        return pixel_jobs[0] if pixel_jobs else None
+    
+    def process_batch(self, file_paths: list):
+        """Index files from their headers in a single transaction
+        
+        Returns (pixel_jobs, errors) where errors maps unreadable paths to
+        their exception. Database errors fail the whole batch.
+        """
+        records = []
+        errors = {}
+        journal_entries = []
+        for file_path in file_paths:
+            try:
+                record = self._read_header(file_path)
+                records.append(record)
+                journal_entries.append(record['journal'])
+            except Exception as e:
+                errors[file_path] = e
+                if os.path.exists(file_path):
+                    journal_entries.append(dict(self.journal.stat(file_path), status='failed', error=str(e)))
+        
+        study_ids = {}
+        created = {}
         db = SessionLocal()
         try:
-            # Read DICOM file
-            ds = pydicom.dcmread(file_path)
-            
-            # Extract metadata
-            study_uid = str(ds.StudyInstanceUID)
-            sop_uid = str(ds.SOPInstanceUID)
-            
-            # Check if study exists
-            study = db.query(Study).filter(Study.study_uid == study_uid).first()
-            if not study:
-                # Create new study
-                study = Study(
-                    study_uid=study_uid,
-                    patient_id=str(getattr(ds, 'PatientID', 'Unknown')),
-                    patient_name=str(getattr(ds, 'PatientName', 'Unknown')),
-                    study_date=self._parse_dicom_date(getattr(ds, 'StudyDate', None)),
-                    meta_json={
-                        'modality': str(getattr(ds, 'Modality', '')),
-                        'institution': str(getattr(ds, 'InstitutionName', '')),
-                        'manufacturer': str(getattr(ds, 'Manufacturer', '')),
-                    },
-                    path_root=os.path.dirname(file_path)
-                )
-                db.add(study)
-                db.flush()
-                
-                # Create task for new study
-                task = Task(study_id=study.id)
-                db.add(task)
+            if records:
+                # Instances already stored keep their file, which may be transcoded
+                existing = {
+                    sop_uid for sop_uid, in db.query(Instance.sop_uid).filter(
+                        Instance.sop_uid.in_({record['instance']['sop_uid'] for record in records})
+                    )
+                }
+                records = [record for record in records if record['instance']['sop_uid'] not in existing]
+                self._place_records(records, errors, journal_entries)
             
-            # Check if instance exists
-            instance = db.query(Instance).filter(Instance.sop_uid == sop_uid).first()
-            if not instance:
-                # Copy to store directory
-                store_path = self._copy_to_store(file_path, study_uid, sop_uid)
+            with self._timed('db_commit'):
+                if records:
+                    study_ids = self._resolve_studies(db, records)
+                    
+                    # Thumbnails are filled in later by the pixel stage
+                    instance_rows = [
+                        dict(record['instance'], study_id=study_ids[record['study']['study_uid']])
+                        for record in records
+                    ]
+                    created = insert_ignore(db, Instance, instance_rows, 'sop_uid')
                 
-                # Generate thumbnail
-                thumbnail_path = self._generate_thumbnail(ds, study_uid, sop_uid)
+                # Journal in the same transaction so a failed batch is retried
+                self.journal.record(db, journal_entries)
                 
-                # Create instance
-                instance = Instance(
-                    study_id=study.id,
-                    sop_uid=sop_uid,
-                    instance_number=int(getattr(ds, 'InstanceNumber', 1)),
-                    path_abs=store_path,
-                    frame_count=int(getattr(ds, 'NumberOfFrames', 1)),
-                    meta_json={
-                        'gestational_age': self._extract_ga(ds),
-                        'birth_weight': self._extract_bw(ds),
-                        'acquisition_datetime': str(getattr(ds, 'AcquisitionDateTime', '')),
-                        'view_position': str(getattr(ds, 'ViewPosition', 'AP')),
-                    },
-                    thumbnail_path=thumbnail_path
-                )
-                db.add(instance)
-            
-            db.commit()
-            print(f"Processed DICOM: {sop_uid}")
-            
+                db.commit()
         except Exception as e:
             db.rollback()
             raise e
         finally:
             db.close()
+        
+        # The inbox copy is only consumed once its instance is committed
+        for record in records:
+            if record['instance']['sop_uid'] in created:
+                self.placer.consume(record['source'])
+        
+        # Only trust ids once they are committed
+        self.study_cache.update(study_ids)
+        
+        pixel_jobs = []
+        for record in records:
+            instance = record['instance']
+            if instance['sop_uid'] in created:
+                pixel_jobs.append({
+                    'instance_id': created.pop(instance['sop_uid']),
+                    'path': instance['path_abs'],
+                    'study_uid': record['study']['study_uid'],
+                    'sop_uid': instance['sop_uid'],
+                })
+        
+        print(f"Indexed {len(pixel_jobs)} new of {len(file_paths) - len(errors)} DICOM files")
+        return pixel_jobs, errors
     
-    def _parse_dicom_date(self, date_str):
-        if not date_str:
-            return None
-        try:
-            return datetime.strptime(str(date_str), '%Y%m%d')
-        except:
-            return None
-    
-    def _copy_to_store(self, src_path: str, study_uid: str, sop_uid: str) -> str:
-        store_dir = Path(settings.DATA_STORE) / study_uid
-        store_dir.mkdir(parents=True, exist_ok=True)
+    def _read_header(self, file_path: str) -> dict:
+        """Parse header fields; the file is placed in the store by _place_records"""
+        # Hash once for both the journal and content-addressed placement
+        digest = None
+        if self.placer.dedup or self.journal.hash_content:
+            digest = file_digest(file_path)
+        
+        journal_entry = self.journal.stat(file_path, content_hash=digest)
         
-        dst_path = store_dir / f"{sop_uid}.dcm"
-        import shutil
-        shutil.copy2(src_path, dst_path)
+        # Header only; pixel data is handled by process_pixels
+        with self._timed('header_parse'):
+            ds = pydicom.dcmread(file_path, stop_before_pixels=True)
         
-        return str(dst_path)
+        # Extract metadata
+        study_uid = str(ds.StudyInstanceUID)
+        sop_uid = str(ds.SOPInstanceUID)
+        
+        return {
+            'source': file_path,
+            'digest': digest,
+            'journal': journal_entry,
+            'study': {
+                'study_uid': study_uid,
+                'patient_id': str(getattr(ds, 'PatientID', 'Unknown')),
+                'patient_name': str(getattr(ds, 'PatientName', 'Unknown')),
+                'study_date': self._parse_dicom_date(getattr(ds, 'StudyDate', None)),
+                'meta_json': {
+                    'modality': str(getattr(ds, 'Modality', '')),
+                    'institution': str(getattr(ds, 'InstitutionName', '')),
+                    'manufacturer': str(getattr(ds, 'Manufacturer', '')),
+                    'description': str(getattr(ds, 'StudyDescription', '')),
+                    'ward': self._extract_ward(ds),
+                },
+                'path_root': os.path.dirname(file_path),
+            },
+            'instance': {
+                'sop_uid': sop_uid,
+                'instance_number': int(getattr(ds, 'InstanceNumber', 1)),
+                'path_abs': None,
+                'frame_count': int(getattr(ds, 'NumberOfFrames', 1)),
+                'meta_json': {
+                    'gestational_age': self._extract_ga(ds),
+                    'birth_weight': self._extract_bw(ds),
+                    'acquisition_datetime': str(getattr(ds, 'AcquisitionDateTime', '')),
+                    'view_position': str(getattr(ds, 'ViewPosition', 'AP')),
+                },
+                'thumbnail_path': None,
+            },
+        }
+    
+    def _place_records(self, records: list, errors: dict, journal_entries: list):
+        """Place new files in the store, dropping records that fail from the batch"""
+        for record in list(records):
+            file_path = record['source']
+            try:
+                with self._timed('store_copy'):
+                    record['instance']['path_abs'] = self._place_in_store(
+                        file_path, record['study']['study_uid'], record['instance']['sop_uid'], record['digest']
+                    )
+            except Exception as e:
+                errors[file_path] = e
+                records.remove(record)
+                record['journal'].update(status='failed', error=str(e))
     
-    def _generate_thumbnail(self, ds, study_uid: str, sop_uid: str) -> str:
-        cache_dir = Path(settings.CACHE_DIR) / study_uid
-        cache_dir.mkdir(parents=True, exist_ok=True)
+    def _resolve_studies(self, db: Session, records: list) -> dict:
+        """Map every study UID in the batch to its id, creating missing studies"""
+        study_ids = {}
+        missing = {}
+        for record in records:
+            study_uid = record['study']['study_uid']
+            if study_uid in self.study_cache:
+                study_ids[study_uid] = self.study_cache[study_uid]
+            else:
+                missing[study_uid] = record['study']
         
-        thumb_path = cache_dir / f"{sop_uid}_thumb.jpg"
+        if not missing:
+            return study_ids
         
-        # Get pixel array
-        pixel_array = ds.pixel_array
+        # Concurrent workers may race on the same study; only one insert wins
+        created = insert_ignore(db, Study, list(missing.values()), 'study_uid')
+        if created:
+            # Create tasks for new studies
+            db.execute(insert(Task), [
+                {'study_id': study_id, 'priority': scheduler.score(missing[study_uid])}
+                for study_uid, study_id in created.items()
+            ])
+            bump(db, {(STUDIES, ''): len(created), (TASKS, TaskStatus.QUEUED.value): len(created)})
         
-        # Normalize and resize
-        if len(pixel_array.shape) == 3:
-            pixel_array = pixel_array[0]  # First frame only
+        study_ids.update(created)
+        existing = [study_uid for study_uid in missing if study_uid not in created]
+        if existing:
+            study_ids.update(
+                db.query(Study.study_uid, Study.id).filter(Study.study_uid.in_(existing)).all()
+            )
         
-        # Window level adjustment
-        window_center = float(getattr(ds, 'WindowCenter', pixel_array.mean()))
-        window_width = float(getattr(ds, 'WindowWidth', pixel_array.max() - pixel_array.min()))
+        return study_ids
+    
+    def process_pixels(self, pixel_job: dict):
+        """Decode pixel data, apply the storage policy and attach the thumbnails"""
+        with self._timed('pixel_decode'):
+            ds = pydicom.dcmread(pixel_job['path'])
+            pixel_array, decode_ms = decode_timed(ds)
+            # First frame only, with the dataset's display window
+            image = render_frame(ds, frame_pixels(ds, 0, pixel_array))
         
-        img_min = window_center - window_width / 2
-        img_max = window_center + window_width / 2
+        with self._timed('thumbnail_encode'):
+            thumbnail_path = self._generate_thumbnail(image, pixel_job['study_uid'], pixel_job['sop_uid'])
         
-        pixel_array = np.clip(pixel_array, img_min, img_max)
-        pixel_array = ((pixel_array - img_min) / (img_max - img_min) * 255).astype(np.uint8)
+        # Reuses this decode, so a slow source codec is paid for only once
+        with self._timed('transcode'):
+            store_path, storage = self.transcoder.transcode(pixel_job['path'], ds, decode_ms)
         
-        # Create thumbnail
-        img = Image.fromarray(pixel_array)
-        img.thumbnail((256, 256), Image.Resampling.LANCZOS)
-        img.save(thumb_path, 'JPEG', quality=85)
+        if TILES_AT_INGEST:
+            with self._timed('tile_build'):
+                tile_pyramid.build(pixel_job['instance_id'], source_version(store_path), image)
         
-        return str(thumb_path)
+        db = SessionLocal()
+        try:
+            instance = db.get(Instance, pixel_job['instance_id'])
+            if instance is not None:
+                instance.thumbnail_path = thumbnail_path
+                instance.path_abs = store_path
+                instance.meta_json = {**(instance.meta_json or {}), 'storage': storage}
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            raise e
+        finally:
+            db.close()
+    
+    def _parse_dicom_date(self, date_str):
+        if not date_str:
+            return None
+        try:
+            return datetime.strptime(str(date_str), '%Y%m%d')
+        except:
+            return None
+    
+    def _place_in_store(self, src_path: str, study_uid: str, sop_uid: str, digest: str = None) -> str:
+        return self.placer.place(src_path, study_uid, sop_uid, digest)
+    
+    def _generate_thumbnail(self, image, study_uid: str, sop_uid: str) -> str:
+        # Every standard size from the one decode; returns the default size's path
+        return write_thumbnails(image, Path(settings.CACHE_DIR) / study_uid, sop_uid)
+    
+    def _extract_ward(self, ds):
+        # Department first; the patient's location is set by fewer modalities
+        for keyword in ('InstitutionalDepartmentName', 'CurrentPatientLocation'):
+            value = str(getattr(ds, keyword, '') or '').strip()
+            if value:
+                return value
+        return ''
     
     def _extract_ga(self, ds):
         # Try to extract gestational age from DICOM tags or description
         description = str(getattr(ds, 'StudyDescription', ''))
         # Simple pattern matching - adjust based on actual data
-        import re
         ga_match = re.search(r'(\d+)w', description, re.IGNORECASE)
         if ga_match:
             return int(ga_match.group(1))
@@ -179,6 +650,9 @@ class IndexerService:
         self.observer = Observer()
         self.handler = DicomHandler()
         self.process_thread = None
+        self.pixel_thread = None
+        self.rescan_thread = None
+        self.settle_thread = None
         
     def start(self):
         inbox_path = settings.DATA_INBOX
@@ -188,12 +662,45 @@ class IndexerService:
         self.observer.schedule(self.handler, inbox_path, recursive=True)
         self.observer.start()
         
-        # Start processing thread
+        # Start dispatcher threads feeding the header and pixel pools
         self.process_thread = threading.Thread(target=self.handler.process_queue, daemon=True)
         self.process_thread.start()
+        self.pixel_thread = threading.Thread(target=self.handler.process_pixel_queue, daemon=True)
+        self.pixel_thread.start()
+        
+        # Pick up files that arrived while the API was down; the observer
+        # is already running, so nothing lands in between
+        self.rescan_thread = threading.Thread(target=self.handler.rescan, args=(inbox_path,), daemon=True)
+        self.rescan_thread.start()
+        self.settle_thread = threading.Thread(target=self._settle_loop, daemon=True)
+        self.settle_thread.start()
         
         print(f"Indexer watching: {inbox_path}")
     
+    def _settle_loop(self):
+        retried = time.monotonic()
+        while not self.handler.stopping.wait(INGEST_SETTLE_SECONDS):
+            try:
+                self.handler.settle()
+                if time.monotonic() - retried >= INGEST_RETRY_SECONDS:
+                    retried = time.monotonic()
+                    self.handler.retry_failed()
+            except Exception as e:
+                print(f"Error settling inbox files: {e}")
+    
     def stop(self):
         self.observer.stop()
-        self.observer.join()
\ No newline at end of file
+        self.observer.join()
+        
+        # Nothing may be enqueued behind the stop sentinel
+        self.handler.stopping.set()
+        if self.rescan_thread:
+            self.rescan_thread.join()
+        if self.settle_thread:
+            self.settle_thread.join()
+        
+        self.handler.stop()
+        if self.process_thread:
+            self.process_thread.join()
+        if self.pixel_thread:
+            self.pixel_thread.join()
\ No newline at end of file
@@ -0,0 +1,115 @@
+# apps/api/app/services/journal.py
+import hashlib
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import IngestRecord
+from app.services.bulk import upsert
+
+# Hash file contents so touched-but-identical files are not re-ingested
+INGEST_JOURNAL_HASH = getattr(settings, 'INGEST_JOURNAL_HASH', False)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_digest(path: str) -> str:
+    """Streamed BLAKE2b digest of a file's contents"""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class IngestJournal:
+    """Records which inbox files were ingested, keyed by path + size + mtime"""
+
+    def __init__(self, hash_content: Optional[bool] = None):
+        self.hash_content = INGEST_JOURNAL_HASH if hash_content is None else hash_content
+
+    def stat(self, path: str, content_hash: Optional[str] = None) -> Dict:
+        """Journal entry describing the file as it is now"""
+        st = os.stat(path)
+        if content_hash is None and self.hash_content:
+            content_hash = file_digest(path)
+
+        return {
+            'path': path,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'content_hash': content_hash,
+        }
+
+    def record(self, db: Session, entries: List[Dict]):
+        """Upsert entries in the caller's transaction"""
+        now = datetime.utcnow()
+        upsert(db, IngestRecord, [
+            {
+                'path': entry['path'],
+                'size': entry['size'],
+                'mtime_ns': entry['mtime_ns'],
+                'content_hash': entry.get('content_hash'),
+                'status': entry.get('status', 'indexed'),
+                'error': entry.get('error'),
+                'updated_at': now,
+            }
+            for entry in entries
+        ], 'path')
+
+    def load(self, db: Session, status: Optional[str] = None) -> Dict[str, Tuple[int, int, Optional[str]]]:
+        """Journal entries as path -> (size, mtime_ns, content_hash), optionally of one status"""
+        query = db.query(
+            IngestRecord.path,
+            IngestRecord.size,
+            IngestRecord.mtime_ns,
+            IngestRecord.content_hash
+        )
+        if status is not None:
+            query = query.filter(IngestRecord.status == status)
+        return {path: (size, mtime_ns, content_hash) for path, size, mtime_ns, content_hash in query}
+
+    def scan(self, root: str, known: Dict[str, Tuple[int, int, Optional[str]]], recursive: bool = True) -> Iterator[str]:
+        """Yield .dcm files under root that are new or changed since journaled
+
+        Only directory entries are stat'ed; files are opened solely to
+        compare content hashes when the size matches but the mtime moved.
+        """
+        stack = [root]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.name.endswith('.dcm') and self._changed(entry, known.get(entry.path)):
+                            yield entry.path
+            except OSError as e:
+                print(f"Error scanning {root}: {e}")
+
+    def changed(self, known: Dict[str, Tuple[int, int, Optional[str]]]) -> Iterator[str]:
+        """Yield journaled paths whose file changed since; files since removed are skipped"""
+        for path, journaled in known.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if self._stat_changed(path, st, journaled):
+                yield path
+
+    def _changed(self, entry: os.DirEntry, journaled) -> bool:
+        if journaled is None:
+            return True
+        return self._stat_changed(entry.path, entry.stat(), journaled)
+
+    def _stat_changed(self, path: str, st: os.stat_result, journaled) -> bool:
+        size, mtime_ns, content_hash = journaled
+        if st.st_size != size:
+            return True
+        if st.st_mtime_ns == mtime_ns:
+            return False
+
+        if self.hash_content and content_hash:
+            return file_digest(path) != content_hash
+        return True
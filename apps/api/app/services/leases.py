@@ -0,0 +1,107 @@
+# apps/api/app/services/leases.py
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from app.core.config import settings
+
+# Seconds a task lease lives without a heartbeat
+LEASE_TTL = getattr(settings, 'LEASE_TTL', 90)
+# 'redis' shares leases between API processes; 'memory' is for a single process
+LEASE_BACKEND = getattr(settings, 'LEASE_BACKEND', 'redis' if getattr(settings, 'REDIS_URL', None) else 'memory')
+LEASE_KEY_PREFIX = 'neocxr:lease:task:'
+
+class MemoryLeaseStore:
+    """In-process leases for single-node deployments
+
+    Leases are lost on restart, so for one TTL after start-up a missing
+    lease is not taken as proof that a task was abandoned; open viewers
+    re-establish theirs with their next heartbeat.
+    """
+
+    def __init__(self):
+        self._leases: Dict[int, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self.authoritative_at = time.time() + LEASE_TTL
+
+    def grant(self, task_id: int, user_id: int, ttl: int = None) -> float:
+        expires_at = time.time() + (ttl or LEASE_TTL)
+        with self._lock:
+            self._leases[task_id] = (user_id, expires_at)
+        return expires_at
+
+    def renew(self, task_id: int, user_id: int, ttl: int = None) -> Optional[float]:
+        """Extend the holder's lease; None if user_id does not hold a live one"""
+        now = time.time()
+        with self._lock:
+            holder = self._leases.get(task_id)
+            if holder is None or holder[0] != user_id or holder[1] <= now:
+                return None
+            expires_at = now + (ttl or LEASE_TTL)
+            self._leases[task_id] = (user_id, expires_at)
+        return expires_at
+
+    def release(self, task_id: int):
+        with self._lock:
+            self._leases.pop(task_id, None)
+
+    def alive(self, task_ids: Iterable[int]) -> Set[int]:
+        now = time.time()
+        with self._lock:
+            # Expired entries are dropped as they are found
+            for task_id in [task_id for task_id, (_, expires_at) in self._leases.items() if expires_at <= now]:
+                del self._leases[task_id]
+            return {task_id for task_id in task_ids if task_id in self._leases}
+
+class RedisLeaseStore:
+    """Leases as Redis keys with a TTL, shared by every API process"""
+
+    # Extend only if the caller still holds the lease
+    RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+    def __init__(self, url: str = None):
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self._renew = self.client.register_script(self.RENEW_SCRIPT)
+        # Leases survive API restarts
+        self.authoritative_at = 0.0
+
+    def _key(self, task_id: int) -> str:
+        return f"{LEASE_KEY_PREFIX}{task_id}"
+
+    def grant(self, task_id: int, user_id: int, ttl: int = None) -> float:
+        ttl = ttl or LEASE_TTL
+        self.client.set(self._key(task_id), str(user_id), px=int(ttl * 1000))
+        return time.time() + ttl
+
+    def renew(self, task_id: int, user_id: int, ttl: int = None) -> Optional[float]:
+        ttl = ttl or LEASE_TTL
+        if not self._renew(keys=[self._key(task_id)], args=[str(user_id), int(ttl * 1000)]):
+            return None
+        return time.time() + ttl
+
+    def release(self, task_id: int):
+        self.client.delete(self._key(task_id))
+
+    def alive(self, task_ids: Iterable[int]) -> Set[int]:
+        task_ids = list(task_ids)
+        if not task_ids:
+            return set()
+        values = self.client.mget([self._key(task_id) for task_id in task_ids])
+        return {task_id for task_id, value in zip(task_ids, values) if value is not None}
+
+def create_lease_store(backend: str = None):
+    backend = backend or LEASE_BACKEND
+    if backend == 'redis':
+        return RedisLeaseStore()
+    if backend == 'memory':
+        return MemoryLeaseStore()
+    raise ValueError(f"Unknown lease backend: {backend}")
+
+lease_store = create_lease_store()
@@ -0,0 +1,129 @@
+# apps/api/app/services/live_stats.py
+import asyncio
+import json
+from typing import AsyncIterator, Dict, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.services.counters import counter_cache, overview_deltas, positive_vocab, COUNTERS_TOPIC, POSITIVE_FINDINGS
+from app.services.events import broker
+from app.services.metrics import gauge
+
+# Seconds of changes folded into one update
+STATS_STREAM_INTERVAL = getattr(settings, 'STATS_STREAM_INTERVAL', 1.0)
+# Seconds between keepalive comments on an idle stream
+STATS_STREAM_KEEPALIVE = getattr(settings, 'STATS_STREAM_KEEPALIVE', 15)
+# Updates a slow client may fall behind by before it is told to resync
+STATS_STREAM_BACKLOG = 32
+
+STATS_STREAMS = gauge('neocxr_stats_streams', 'Open live dashboard streams')
+
+# Sent when updates were lost; the client reloads the overview
+RESYNC = {'resync': True}
+
+def _event(name: str, data) -> str:
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+class LiveStats:
+    """Fans committed counter changes out to open dashboard streams
+
+    One subscription per process, however many dashboards are open.
+    Changes are coalesced over STATS_STREAM_INTERVAL, so a burst of
+    claims or an ingest batch becomes one update. Idle dashboards cost a
+    keepalive line every STATS_STREAM_KEEPALIVE seconds and no queries.
+    """
+
+    def __init__(self, interval: float = None):
+        self.interval = STATS_STREAM_INTERVAL if interval is None else interval
+        self._listeners: Set[asyncio.Queue] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def listen(self) -> asyncio.Queue:
+        queue = asyncio.Queue(STATS_STREAM_BACKLOG)
+        self._listeners.add(queue)
+        STATS_STREAMS.set(len(self._listeners))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(broker.subscribe(COUNTERS_TOPIC)))
+        return queue
+
+    def unlisten(self, queue: asyncio.Queue):
+        self._listeners.discard(queue)
+        STATS_STREAMS.set(len(self._listeners))
+        if not self._listeners and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _broadcast(self, update: Dict):
+        for queue in list(self._listeners):
+            try:
+                queue.put_nowait(update)
+            except asyncio.QueueFull:
+                # Too far behind to catch up with deltas
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+    def _positive_vocab(self) -> int:
+        db = SessionLocal()
+        try:
+            return positive_vocab(counter_cache.snapshot(db, fresh=True))
+        finally:
+            db.close()
+
+    async def _run(self, subscription):
+        try:
+            while True:
+                batch = [await subscription.get()]
+                await asyncio.sleep(self.interval)
+                while not subscription.queue.empty():
+                    batch.append(subscription.get_nowait())
+
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    self._broadcast(RESYNC)
+                    continue
+
+                deltas = {}
+                for changes in batch:
+                    for name, scope, value in changes:
+                        deltas[(name, scope)] = deltas.get((name, scope), 0) + value
+                update = {'deltas': deltas}
+                # A distinct count; re-read once for every stream in the process
+                if any(name == POSITIVE_FINDINGS and value for (name, _), value in deltas.items()):
+                    update['positive_vocab'] = await run_in_threadpool(self._positive_vocab)
+                self._broadcast(update)
+        except Exception as e:
+            if not isinstance(e, asyncio.CancelledError):
+                print(f"Live stats error: {e}")
+                self._broadcast(RESYNC)
+            raise
+        finally:
+            broker.unsubscribe(subscription)
+            if self._task is asyncio.current_task():
+                self._task = None
+
+    async def stream(self, queue: asyncio.Queue, user_id: int, snapshot: Dict) -> AsyncIterator[str]:
+        """Server-sent events: the current overview, then per-user deltas"""
+        try:
+            yield f"retry: 5000\n\n{_event('snapshot', snapshot)}"
+            while True:
+                try:
+                    update = await asyncio.wait_for(queue.get(), STATS_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if update is RESYNC:
+                    yield _event('resync', {})
+                    continue
+                changes = overview_deltas(update['deltas'], user_id)
+                if 'positive_vocab' in update:
+                    yield _event('delta', {'changes': changes, 'set': {'positive_vocab': update['positive_vocab']}})
+                elif changes:
+                    yield _event('delta', {'changes': changes})
+        finally:
+            self.unlisten(queue)
+
+live_stats = LiveStats()
\ No newline at end of file
@@ -1,12 +1,117 @@
 # apps/api/app/services/ontology.py
+import hashlib
 import json
+import threading
+import time
 import yaml
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import List, Dict, Optional
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Optional, Tuple
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from app.models.models import OntologyClass
+from app.models.models import OntologyClass, OntologyImport
 from app.core.config import settings
+from app.services.events import broker
+
+# Seconds between version checks, in case an invalidation event was missed
+ONTOLOGY_CHECK_INTERVAL = getattr(settings, 'ONTOLOGY_CHECK_INTERVAL', 60)
+ONTOLOGY_TOPIC = 'ontology'
+
+@dataclass(frozen=True)
+class OntologyEntry:
+    id: int
+    name: str
+    name_tr: Optional[str]
+    kind: str
+    color: Optional[str]
+    priority: int
+    is_active: bool
+    
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+@dataclass(frozen=True)
+class OntologySnapshot:
+    """Every ontology class as of one version; never modified once built"""
+    version: int
+    classes: Tuple[OntologyEntry, ...]  # in priority order
+    by_id: Mapping[int, OntologyEntry]
+    digest: str
+    
+    @classmethod
+    def build(cls, version: int, rows) -> 'OntologySnapshot':
+        classes = tuple(sorted(
+            (OntologyEntry(row.id, row.name, row.name_tr, row.kind, row.color, row.priority or 0, bool(row.is_active)) for row in rows),
+            key=lambda entry: (entry.priority, entry.id)
+        ))
+        # Content hash, so every worker derives the same ETag for the same ontology
+        digest = hashlib.sha1(json.dumps([entry.to_dict() for entry in classes], ensure_ascii=False).encode()).hexdigest()[:16]
+        return cls(version, classes, MappingProxyType({entry.id: entry for entry in classes}), digest)
+    
+    def etag(self, *variant) -> str:
+        return '"' + '-'.join(['ontology', self.digest, *[str(part) for part in variant]]) + '"'
+    
+    def get(self, class_id: int) -> Optional[OntologyEntry]:
+        return self.by_id.get(class_id)
+    
+    def active(self, kind: Optional[str] = None) -> List[OntologyEntry]:
+        return [entry for entry in self.classes if entry.is_active and (kind is None or entry.kind == kind)]
+    
+    def name(self, class_id: int) -> Optional[str]:
+        entry = self.by_id.get(class_id)
+        return entry.name if entry else None
+
+class OntologyRegistry:
+    """Process-wide ontology snapshot, reloaded only when the ontology changes
+    
+    Imports record a new version and publish an invalidation event that
+    reaches every API process; a periodic version check covers missed
+    events. Readers get the whole snapshot and never query per class.
+    """
+    
+    def __init__(self, check_interval: float = None):
+        self.check_interval = ONTOLOGY_CHECK_INTERVAL if check_interval is None else check_interval
+        self._snapshot: Optional[OntologySnapshot] = None
+        self._checked_at = 0.0
+        # Bumped on invalidation, so a load racing with it is not kept
+        self._generation = 0
+        self._listening = False
+        self._lock = threading.Lock()
+    
+    def invalidate(self, *_):
+        with self._lock:
+            self._snapshot = None
+            self._generation += 1
+    
+    def _version(self, db: Session) -> int:
+        return db.execute(select(func.coalesce(func.max(OntologyImport.id), 0))).scalar()
+    
+    def snapshot(self, db: Session) -> OntologySnapshot:
+        if not self._listening:
+            self._listening = True
+            broker.on(ONTOLOGY_TOPIC, self.invalidate)
+        
+        with self._lock:
+            snapshot = self._snapshot
+            generation = self._generation
+            due = time.monotonic() - self._checked_at >= self.check_interval
+        
+        if snapshot is not None and not due:
+            return snapshot
+        
+        version = self._version(db)
+        if snapshot is None or snapshot.version != version:
+            snapshot = OntologySnapshot.build(version, db.execute(select(OntologyClass)).scalars().all())
+        
+        with self._lock:
+            if self._generation == generation:
+                self._snapshot = snapshot
+                self._checked_at = time.monotonic()
+        return snapshot
+
+ontology_registry = OntologyRegistry()
 
 class OntologyService:
     def __init__(self, db: Session):
@@ -56,7 +161,11 @@ class OntologyService:
             )
             self.db.add(onto_class)
         
+        # New snapshot version for every API process
+        self.db.add(OntologyImport())
         self.db.commit()
+        ontology_registry.invalidate()
+        broker.publish(ONTOLOGY_TOPIC, {'invalidate': True})
     
     def get_active_classes(self, kind: Optional[str] = None) -> List[OntologyClass]:
         """Get active ontology classes"""
@@ -0,0 +1,111 @@
+# apps/api/app/services/pixel_cache.py
+import os
+import threading
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pydicom
+from pydicom.dataset import Dataset
+
+from app.core.config import settings
+from app.services.metrics import counter, gauge
+from app.services.store import DISK_TRIM_RATIO, directory_size, source_version, trim_directory
+from app.services.transcode import decode_timed, record_stored_decode
+
+PIXEL_CACHE_BYTES = getattr(settings, 'PIXEL_CACHE_BYTES', 20 * 1024 * 1024 * 1024)
+
+PIXEL_CACHE_REQUESTS = counter(
+    'neocxr_pixel_cache_requests_total', 'Decoded pixel cache lookups', ['result']
+)
+PIXEL_CACHE_BYTES_USED = gauge(
+    'neocxr_pixel_cache_bytes', 'Bytes held by the decoded pixel cache'
+)
+
+class PixelCache:
+    """Decoded frames of each instance, stored once as memory-mapped .npy files
+
+    Arrays hold stored values shaped (frames, rows, columns[, samples]);
+    rescale and windowing happen at render time through the rendering
+    LUT, which keeps integer data on its fast path. Files are keyed by
+    the source file's size and mtime, so a rewritten source is decoded
+    again, and the directory is trimmed least-recently-used first.
+    """
+
+    def __init__(self, root: str = None, budget_bytes: int = None):
+        self.root = Path(root or Path(settings.CACHE_DIR) / 'pixels')
+        self.budget = PIXEL_CACHE_BYTES if budget_bytes is None else budget_bytes
+        self._bytes = None  # measured lazily on first write
+        self._lock = threading.Lock()
+
+        PIXEL_CACHE_BYTES_USED.set_function(lambda: self._bytes or 0)
+
+    def path(self, instance_id: int, version: str) -> Path:
+        return self.root / str(instance_id) / f"{version}.npy"
+
+    def frames(self, instance_id: int, file_path: str) -> Tuple[Dataset, np.ndarray]:
+        """Header dataset and read-only (frames, ...) array for an instance"""
+        version = source_version(file_path)
+        path = self.path(instance_id, version)
+
+        try:
+            frames = np.load(path, mmap_mode='r')
+            os.utime(path)
+            PIXEL_CACHE_REQUESTS.inc(result='hit')
+            return pydicom.dcmread(file_path, stop_before_pixels=True), frames
+        except (OSError, ValueError):
+            PIXEL_CACHE_REQUESTS.inc(result='miss')
+
+        ds = pydicom.dcmread(file_path)
+        pixel_array, decode_ms = decode_timed(ds)
+        frames = self.store(instance_id, version, ds, pixel_array)
+        record_stored_decode(instance_id, decode_ms)
+        # Let the in-memory decode go; callers only need the header
+        return pydicom.dcmread(file_path, stop_before_pixels=True), frames
+
+    def frame(self, instance_id: int, file_path: str, frame: int) -> Tuple[Dataset, np.ndarray]:
+        """Header dataset and one frame; raises IndexError when out of range"""
+        ds, frames = self.frames(instance_id, file_path)
+        if not 0 <= frame < frames.shape[0]:
+            if frames.shape[0] == 1:
+                raise IndexError("Single frame image, frame number must be 0")
+            raise IndexError("Frame number out of range")
+        return ds, frames[frame]
+
+    def store(self, instance_id: int, version: str, ds: Dataset, pixel_array: np.ndarray) -> np.ndarray:
+        """Write decoded pixels for an instance and return them memory-mapped"""
+        if int(getattr(ds, 'NumberOfFrames', 1) or 1) == 1:
+            pixel_array = pixel_array[np.newaxis]
+
+        path = self.path(instance_id, version)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+        mapped = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=pixel_array.dtype, shape=pixel_array.shape)
+        mapped[...] = pixel_array
+        mapped.flush()
+        del mapped
+        os.replace(tmp_path, path)
+        # Mapped before trimming; the mapping outlives an unlink
+        frames = np.load(path, mmap_mode='r')
+
+        # Decodes of an older version of the source are dead weight
+        for old_path in path.parent.glob('*.npy'):
+            if old_path != path:
+                old_path.unlink(missing_ok=True)
+
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = directory_size(self.root)
+            else:
+                self._bytes += path.stat().st_size
+            over_budget = self._bytes > self.budget
+
+        if over_budget:
+            remaining = trim_directory(self.root, self.budget * DISK_TRIM_RATIO)
+            with self._lock:
+                self._bytes = remaining
+
+        return frames
+
+pixel_cache = PixelCache()
@@ -0,0 +1,116 @@
+# apps/api/app/services/prefetch.py
+import os
+import queue
+import threading
+from typing import Iterable, Set, Tuple
+
+from app.core.config import settings
+from app.services.metrics import counter, gauge
+from app.services.pixel_cache import pixel_cache
+from app.services.render_cache import render_cache
+from app.services.rendering import encode_image, render_frame
+from app.services.store import source_version
+
+# Upcoming tasks /tasks/next may hint at; clients ask for fewer with ?prefetch=
+PREFETCH_MAX = getattr(settings, 'PREFETCH_MAX', 3)
+PREFETCH_WORKERS = getattr(settings, 'PREFETCH_WORKERS', 1)
+PREFETCH_QUEUE_SIZE = getattr(settings, 'PREFETCH_QUEUE_SIZE', 64)
+
+PREFETCH_JOBS = counter(
+    'neocxr_prefetch_jobs_total', 'Cache warm-up jobs by outcome', ['result']
+)
+PREFETCH_QUEUE_DEPTH = gauge(
+    'neocxr_prefetch_queue_depth', 'Instances waiting to be warmed'
+)
+
+class CacheWarmer:
+    """Background warm-up of the caches a viewer hits when it opens an instance
+
+    For each instance: read-ahead of the P10 file into the page cache,
+    a decode into the pixel cache, and the default first-frame render
+    into the render cache. The queue is bounded and hints that do not
+    fit are dropped; warming is an optimisation, never a backlog.
+    """
+
+    def __init__(self, workers: int = None, queue_size: int = None):
+        self.workers = workers or PREFETCH_WORKERS
+        self.queue = queue.Queue(maxsize=queue_size or PREFETCH_QUEUE_SIZE)
+        self._pending: Set[int] = set()
+        self._threads = []
+        self._lock = threading.Lock()
+
+        PREFETCH_QUEUE_DEPTH.set_function(self.queue.qsize)
+
+    def submit(self, instances: Iterable[Tuple[int, str]]):
+        """Queue (instance_id, path) pairs for warming without blocking"""
+        self._start()
+        for instance_id, path in instances:
+            with self._lock:
+                if instance_id in self._pending:
+                    continue
+                self._pending.add(instance_id)
+            try:
+                self.queue.put_nowait((instance_id, path))
+            except queue.Full:
+                with self._lock:
+                    self._pending.discard(instance_id)
+                PREFETCH_JOBS.inc(result='dropped')
+
+    def _start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for n in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'prefetch-{n}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+
+            instance_id, path = job
+            try:
+                PREFETCH_JOBS.inc(result=self.warm(instance_id, path))
+            except Exception as e:
+                PREFETCH_JOBS.inc(result='failed')
+                print(f"Prefetch error for instance {instance_id}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(instance_id)
+
+    def warm(self, instance_id: int, path: str) -> str:
+        if not os.path.exists(path):
+            return 'skipped'
+
+        # The client fetches the P10 next; have the kernel read it ahead
+        if hasattr(os, 'posix_fadvise'):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+
+        # Same key as an unparameterised /dicom/{id}/frame/0 request
+        cache_key = render_cache.key(instance_id, source_version(path), 0, None, None, None, 'png')
+        if render_cache.get(cache_key) is not None:
+            return 'cached'
+
+        ds, pixels = pixel_cache.frame(instance_id, path, 0)
+        render_cache.put(cache_key, encode_image(render_frame(ds, pixels), 'png'))
+        return 'warmed'
+
+    def shutdown(self):
+        # Pending hints are worthless once the server stops
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        for _ in self._threads:
+            self.queue.put(None)
+        self._threads = []
+
+cache_warmer = CacheWarmer()
@@ -0,0 +1,147 @@
+# apps/api/app/services/render_cache.py
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.core.config import settings
+from app.services.metrics import counter, gauge
+from app.services.store import DISK_TRIM_RATIO, directory_size, trim_directory
+
+RENDER_CACHE_MEMORY_BYTES = getattr(settings, 'RENDER_CACHE_MEMORY_BYTES', 256 * 1024 * 1024)
+RENDER_CACHE_DISK_BYTES = getattr(settings, 'RENDER_CACHE_DISK_BYTES', 5 * 1024 * 1024 * 1024)
+
+RENDER_CACHE_REQUESTS = counter(
+    'neocxr_render_cache_requests_total', 'Rendered image cache lookups', ['tier', 'result']
+)
+RENDER_CACHE_BYTES = gauge(
+    'neocxr_render_cache_bytes', 'Bytes held by the rendered image cache', ['tier']
+)
+
+class RenderCache:
+    """Two-tier cache of encoded frame/thumbnail images
+
+    Memory is an LRU bounded by total bytes; the disk tier lives under
+    CACHE_DIR/render and is trimmed oldest-first by mtime, which hits
+    refresh.
+    """
+
+    def __init__(self, memory_bytes: int = None, disk_bytes: int = None, disk_dir: str = None):
+        self.memory_budget = RENDER_CACHE_MEMORY_BYTES if memory_bytes is None else memory_bytes
+        self.disk_budget = RENDER_CACHE_DISK_BYTES if disk_bytes is None else disk_bytes
+        self.disk_dir = Path(disk_dir or Path(settings.CACHE_DIR) / 'render')
+
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None  # measured lazily on first write
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        RENDER_CACHE_BYTES.set_function(lambda: self._memory_bytes, tier='memory')
+        RENDER_CACHE_BYTES.set_function(lambda: self._disk_bytes or 0, tier='disk')
+
+    @staticmethod
+    def key(
+        instance_id: int,
+        version: str,
+        frame: int,
+        window_center: Optional[float],
+        window_width: Optional[float],
+        size: Optional[int],
+        format: str
+    ) -> str:
+        """Cache key; version identifies the source file contents"""
+        return f"{instance_id}/{version}_{frame}_{window_center}_{window_width}_{size}.{format.lower()}"
+
+    def peek(self, key: str) -> Optional[bytes]:
+        """Memory-tier lookup only; cheap enough to call on the event loop"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is None:
+                return None
+            self._memory.move_to_end(key)
+            self._stats['memory_hits'] += 1
+        RENDER_CACHE_REQUESTS.inc(tier='memory', result='hit')
+        return data
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+        if data is not None:
+            RENDER_CACHE_REQUESTS.inc(tier='memory', result='hit')
+            return data
+
+        path = self.disk_dir / key
+        try:
+            data = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self._stats['misses'] += 1
+            RENDER_CACHE_REQUESTS.inc(tier='disk', result='miss')
+            return None
+
+        with self._lock:
+            self._stats['disk_hits'] += 1
+        RENDER_CACHE_REQUESTS.inc(tier='disk', result='hit')
+        self._put_memory(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        self._put_memory(key, data)
+        self._put_disk(key, data)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(
+                self._stats,
+                memory_bytes=self._memory_bytes,
+                memory_entries=len(self._memory),
+                disk_bytes=self._disk_bytes,
+            )
+
+    def _put_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_budget:
+            return
+
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= len(previous)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+
+            while self._memory_bytes > self.memory_budget:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _put_disk(self, key: str, data: bytes):
+        if not self.disk_budget:
+            return
+
+        path = self.disk_dir / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = directory_size(self.disk_dir)
+            else:
+                self._disk_bytes += len(data)
+            over_budget = self._disk_bytes > self.disk_budget
+
+        if over_budget:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        total = trim_directory(self.disk_dir, self.disk_budget * DISK_TRIM_RATIO)
+        with self._lock:
+            self._disk_bytes = total
+
+render_cache = RenderCache()
@@ -0,0 +1,163 @@
+# apps/api/app/services/rendering.py
+import io
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+from pydicom.dataset import Dataset
+from pydicom.multival import MultiValue
+
+# PIL format names for the formats the API serves
+FORMATS = {'png': 'PNG', 'jpeg': 'JPEG', 'jpg': 'JPEG', 'webp': 'WEBP'}
+MEDIA_TYPES = {'PNG': 'image/png', 'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+def _first(value):
+    """First value of a possibly multi-valued element"""
+    if isinstance(value, (MultiValue, list, tuple)):
+        return value[0] if len(value) else None
+    return value
+
+def rescale_params(ds: Dataset) -> Tuple[float, float]:
+    slope = _first(getattr(ds, 'RescaleSlope', None))
+    intercept = _first(getattr(ds, 'RescaleIntercept', None))
+    return (
+        float(slope) if slope not in (None, '') else 1.0,
+        float(intercept) if intercept not in (None, '') else 0.0
+    )
+
+def frame_pixels(ds: Dataset, frame: int, pixel_array: Optional[np.ndarray] = None) -> np.ndarray:
+    """Stored values of one frame; raises IndexError when out of range"""
+    pixels = ds.pixel_array if pixel_array is None else pixel_array
+    frame_count = int(getattr(ds, 'NumberOfFrames', 1) or 1)
+
+    if frame_count > 1:
+        if not 0 <= frame < pixels.shape[0]:
+            raise IndexError("Frame number out of range")
+        return pixels[frame]
+    if frame != 0:
+        raise IndexError("Single frame image, frame number must be 0")
+    return pixels
+
+def window_params(
+    ds: Dataset,
+    pixels: np.ndarray,
+    window_center: Optional[float] = None,
+    window_width: Optional[float] = None
+) -> Tuple[float, float]:
+    """Window in rescaled units: request, then dataset, then full pixel range"""
+    if window_center is None:
+        window_center = _first(getattr(ds, 'WindowCenter', None))
+    if window_width is None:
+        window_width = _first(getattr(ds, 'WindowWidth', None))
+
+    if window_center in (None, '') or window_width in (None, ''):
+        slope, intercept = rescale_params(ds)
+        low, high = sorted((float(pixels.min()) * slope + intercept, float(pixels.max()) * slope + intercept))
+        return (low + high) / 2, max(high - low, 1.0)
+
+    return float(window_center), max(float(window_width), 1.0)
+
+def _window(values: np.ndarray, center: float, width: float) -> np.ndarray:
+    """DICOM linear VOI function (PS3.3 C.11.2.1.2) onto 0..1, in place for float input"""
+    values -= center - 0.5
+    values /= max(width - 1, 1e-3)
+    values += 0.5
+    np.clip(values, 0, 1, out=values)
+    return values
+
+@lru_cache(maxsize=64)
+def _linear_lut(dtype_str: str, slope: float, intercept: float, center: float, width: float, invert: bool) -> np.ndarray:
+    dtype = np.dtype(dtype_str)
+    domain = np.arange(1 << (8 * dtype.itemsize), dtype=f'u{dtype.itemsize}').view(dtype)
+
+    values = domain.astype(np.float32)
+    values *= slope
+    values += intercept
+    _window(values, center, width)
+    if invert:
+        values = 1 - values
+
+    lut = (values * 255 + 0.5).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+def _voi_lut(ds: Dataset, dtype: np.dtype, invert: bool) -> np.ndarray:
+    from pydicom.pixel_data_handlers.util import apply_voi_lut
+
+    domain = np.arange(1 << (8 * dtype.itemsize), dtype=f'u{dtype.itemsize}').view(dtype)
+    values = apply_voi_lut(domain, ds).astype(np.float32)
+    low, high = float(values.min()), float(values.max())
+    values -= low
+    values /= max(high - low, 1e-3)
+    if invert:
+        values = 1 - values
+    return (values * 255 + 0.5).astype(np.uint8)
+
+def render_frame(
+    ds: Dataset,
+    pixels: np.ndarray,
+    window_center: Optional[float] = None,
+    window_width: Optional[float] = None
+) -> np.ndarray:
+    """Map one frame of stored values to 8-bit display values
+
+    Applies Modality LUT rescale, then the requested window, the dataset
+    window or its VOI LUT, and MONOCHROME1 inversion. Integer data of up
+    to 16 bits goes through a single lookup table indexed by the stored
+    values, so no full-size float temporaries are created.
+    """
+    if getattr(ds, 'SamplesPerPixel', 1) != 1:
+        # Colour data is displayed as stored
+        return pixels if pixels.dtype == np.uint8 else (pixels >> (8 * pixels.itemsize - 8)).astype(np.uint8)
+
+    invert = getattr(ds, 'PhotometricInterpretation', '') == 'MONOCHROME1'
+    explicit_window = window_center is not None and window_width is not None
+
+    if pixels.dtype.kind in 'iu' and pixels.dtype.itemsize <= 2:
+        if not explicit_window and 'VOILUTSequence' in ds and 'WindowCenter' not in ds:
+            lut = _voi_lut(ds, pixels.dtype, invert)
+        else:
+            slope, intercept = rescale_params(ds)
+            center, width = window_params(ds, pixels, window_center, window_width)
+            lut = _linear_lut(pixels.dtype.str, slope, intercept, center, width, invert)
+
+        index = pixels.view(f'u{pixels.dtype.itemsize}')
+        out = np.empty(pixels.shape, dtype=np.uint8)
+        # Indices always lie inside the LUT; 'clip' skips the bounds error path
+        np.take(lut, index, out=out, mode='clip')
+        return out
+
+    # Wide integer or float data: one float32 working copy, updated in place
+    slope, intercept = rescale_params(ds)
+    center, width = window_params(ds, pixels, window_center, window_width)
+    values = pixels.astype(np.float32)
+    values *= slope
+    values += intercept
+    _window(values, center, width)
+    if invert:
+        np.subtract(1, values, out=values)
+    values *= 255
+    values += 0.5
+    return values.astype(np.uint8)
+
+def to_image(image: np.ndarray, size: Optional[int] = None) -> Image.Image:
+    """PIL image, downscaled to fit within size x size if given"""
+    img = Image.fromarray(image)
+    if size:
+        # reducing_gap box-reduces first, keeping LANCZOS cheap on large images
+        img.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return img
+
+def encode_image(image: np.ndarray, format: str = 'png', size: Optional[int] = None, quality: int = 85) -> bytes:
+    pil_format = FORMATS.get(format.lower())
+    if pil_format is None:
+        raise ValueError(f"Unsupported image format: {format}")
+
+    img_bytes = io.BytesIO()
+    options = {'quality': quality} if pil_format in ('JPEG', 'WEBP') else {}
+    to_image(image, size).save(img_bytes, format=pil_format, **options)
+    return img_bytes.getvalue()
+
+def media_type(format: str) -> str:
+    return MEDIA_TYPES[FORMATS[format.lower()]]
@@ -0,0 +1,78 @@
+# apps/api/app/services/scheduler.py
+from typing import Dict, Iterable, List, Tuple, Type
+
+from app.core.config import settings
+from app.models.models import TaskStatus, UserRole
+
+# Scoring policies applied when a study's task is created, e.g.
+#   [{'policy': 'keyword', 'weights': {'pneumothorax': 100, 'pnömotoraks': 100}},
+#    {'policy': 'ward', 'weights': {'NICU-1': 20}}]
+TASK_PRIORITY_POLICIES = getattr(settings, 'TASK_PRIORITY_POLICIES', [])
+
+# Queues each role claims from, in order of preference
+ROLE_QUEUES: Dict[UserRole, Tuple[TaskStatus, ...]] = {
+    UserRole.ANNOTATOR: (TaskStatus.QUEUED,),
+    UserRole.ADJUDICATOR: (TaskStatus.NEEDS_REVIEW, TaskStatus.QUEUED),
+    UserRole.PM: (TaskStatus.QUEUED,),
+    UserRole.ADMIN: (TaskStatus.NEEDS_REVIEW, TaskStatus.QUEUED),
+}
+
+POLICIES: Dict[str, Type['PriorityPolicy']] = {}
+
+def register_policy(name: str):
+    """Class decorator making a policy available to TASK_PRIORITY_POLICIES"""
+    def register(cls):
+        POLICIES[name] = cls
+        return cls
+    return register
+
+class PriorityPolicy:
+    """Scores a study when its task is created; the scores of all policies add up"""
+
+    def score(self, study: dict) -> int:
+        raise NotImplementedError
+
+@register_policy('keyword')
+class KeywordPolicy(PriorityPolicy):
+    """Weight of every keyword found in the study's description fields"""
+
+    def __init__(self, weights: Dict[str, int], fields: Iterable[str] = ('description',)):
+        self.weights = {keyword.casefold(): weight for keyword, weight in weights.items()}
+        self.fields = tuple(fields)
+
+    def score(self, study: dict) -> int:
+        meta = study.get('meta_json') or {}
+        text = ' '.join(str(meta.get(field) or '') for field in self.fields).casefold()
+        return sum(weight for keyword, weight in self.weights.items() if keyword in text)
+
+@register_policy('ward')
+class WardPolicy(PriorityPolicy):
+    """Fixed weight per ward the study was sent from"""
+
+    def __init__(self, weights: Dict[str, int]):
+        self.weights = {ward.casefold(): weight for ward, weight in weights.items()}
+
+    def score(self, study: dict) -> int:
+        ward = str((study.get('meta_json') or {}).get('ward') or '').casefold()
+        return self.weights.get(ward, 0)
+
+class Scheduler:
+    """Task priority at creation time and the queue order for each role"""
+
+    def __init__(self, policies: List[dict] = None):
+        configured = TASK_PRIORITY_POLICIES if policies is None else policies
+        self.policies = []
+        for config in configured:
+            config = dict(config)
+            name = config.pop('policy')
+            if name not in POLICIES:
+                raise ValueError(f"Unknown task priority policy: {name}")
+            self.policies.append(POLICIES[name](**config))
+
+    def score(self, study: dict) -> int:
+        return sum(policy.score(study) for policy in self.policies)
+
+    def queues(self, role) -> Tuple[TaskStatus, ...]:
+        return ROLE_QUEUES.get(role, (TaskStatus.QUEUED,))
+
+scheduler = Scheduler()
@@ -0,0 +1,168 @@
+# apps/api/app/services/store.py
+import errno
+import os
+import shutil
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from app.core.config import settings
+
+# Placement strategies, tried in order until one succeeds. 'rename' moves
+# the file: it is hardlinked into the store and the inbox copy is removed
+# only once its instance is committed.
+STORE_PLACEMENT = getattr(settings, 'STORE_PLACEMENT', 'hardlink,reflink,copy')
+# Store files under their content digest so identical pushes share one object
+STORE_DEDUP = getattr(settings, 'STORE_DEDUP', False)
+
+# Derived-file caches trim to this fraction of their budget so trims are rare
+DISK_TRIM_RATIO = 0.9
+
+# Linux ioctl for copy-on-write clones (btrfs, XFS, overlay on top of them)
+FICLONE = 0x40049409
+
+# Failures that mean "try the next strategy" rather than a real I/O error
+FALLBACK_ERRNOS = {
+    errno.EXDEV, errno.EPERM, errno.EACCES, errno.EMLINK,
+    errno.EINVAL, errno.ENOTTY, errno.EOPNOTSUPP, errno.ENOSYS,
+}
+
+def parse_placement(policy) -> List[str]:
+    if isinstance(policy, str):
+        policy = policy.split(',')
+    strategies = [strategy.strip() for strategy in policy if strategy.strip()]
+
+    unknown = set(strategies) - set(PLACEMENT_STRATEGIES) - {'rename'}
+    if unknown:
+        raise ValueError(f"Unknown store placement strategies: {', '.join(sorted(unknown))}")
+    return strategies
+
+def object_path(digest: str) -> Path:
+    """Content-addressed location for a file digest"""
+    return Path(settings.DATA_STORE) / 'objects' / digest[:2] / f"{digest}.dcm"
+
+def source_version(path) -> str:
+    """Identifies a stored file's contents for derived-image caches"""
+    st = os.stat(path)
+    return f"{st.st_size:x}-{st.st_mtime_ns:x}"
+
+def directory_size(root: Path) -> int:
+    return sum(path.stat().st_size for path in root.rglob('*') if path.is_file())
+
+def trim_directory(root: Path, target_bytes: float) -> int:
+    """Delete least recently touched files under root until it fits target_bytes
+
+    Dotfiles and *.tmp files are in-flight writes and are left alone.
+    Returns the bytes remaining.
+    """
+    files = []
+    for path in root.rglob('*'):
+        # Another writer's temporary file, about to be renamed into place
+        if any(part.startswith('.') or part.endswith('.tmp') for part in path.relative_to(root).parts):
+            continue
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if path.is_file():
+            files.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= target_bytes:
+            break
+        try:
+            path.unlink()
+            total -= size
+        except OSError:
+            pass
+
+    return total
+
+def place_file(src: str, dst: Path, strategies: Sequence[str]) -> str:
+    """Put src at dst using the first strategy the filesystem allows
+
+    Every strategy ends with an atomic rename onto dst, so readers never
+    see a partially written store file. Returns the strategy used.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+
+    for strategy in strategies:
+        tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+        try:
+            PLACEMENT_STRATEGIES[strategy](src, str(tmp_path), str(dst))
+            return strategy
+        except OSError as e:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            if e.errno not in FALLBACK_ERRNOS or strategy == strategies[-1]:
+                raise
+
+    raise ValueError("No store placement strategy configured")
+
+def _hardlink(src: str, tmp_path: str, dst: str):
+    os.link(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+def _reflink(src: str, tmp_path: str, dst: str):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError(errno.ENOSYS, "reflink is not supported on this platform")
+
+    with open(src, 'rb') as src_file, open(tmp_path, 'wb') as tmp_file:
+        fcntl.ioctl(tmp_file.fileno(), FICLONE, src_file.fileno())
+    shutil.copystat(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+def _copy(src: str, tmp_path: str, dst: str):
+    # copyfile streams through sendfile/copy_file_range where available
+    shutil.copyfile(src, tmp_path)
+    shutil.copystat(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+PLACEMENT_STRATEGIES = {
+    'hardlink': _hardlink,
+    'reflink': _reflink,
+    'copy': _copy,
+}
+
+class StorePlacer:
+    """Places ingested files in DATA_STORE according to the placement policy
+
+    Placement never removes the inbox file, so a batch that fails to
+    commit leaves it for the rescan. With 'rename' in the policy the
+    caller consumes it once the batch has committed.
+    """
+
+    def __init__(self, placement=None, dedup: Optional[bool] = None):
+        strategies = parse_placement(placement or STORE_PLACEMENT)
+        # A rename on the same filesystem is a hardlink plus the later unlink
+        self.moves = 'rename' in strategies
+        self.strategies = list(dict.fromkeys(
+            'hardlink' if strategy == 'rename' else strategy for strategy in strategies
+        ))
+        self.dedup = STORE_DEDUP if dedup is None else dedup
+
+    def place(self, src: str, study_uid: str, sop_uid: str, digest: Optional[str] = None) -> str:
+        """Place src in the store and return its stored path"""
+        if self.dedup:
+            if digest is None:
+                raise ValueError("Content digest required for deduplicated placement")
+
+            dst = object_path(digest)
+            if dst.exists():
+                return str(dst)
+        else:
+            dst = Path(settings.DATA_STORE) / study_uid / f"{sop_uid}.dcm"
+
+        place_file(src, dst, self.strategies)
+        return str(dst)
+
+    def consume(self, src: str):
+        """Remove a committed inbox file when the policy moves files"""
+        if not self.moves:
+            return
+        try:
+            os.unlink(src)
+        except FileNotFoundError:
+            pass
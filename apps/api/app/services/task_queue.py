@@ -0,0 +1,209 @@
+# apps/api/app/services/task_queue.py
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import Task, TaskStatus, User
+from app.services.counters import bump, merge, task_deltas
+from app.services.leases import lease_store, LEASE_TTL
+from app.services.metrics import counter, histogram
+from app.services.scheduler import scheduler
+
+# Most tasks one /tasks/claim call may lock
+TASK_CLAIM_MAX = getattr(settings, 'TASK_CLAIM_MAX', 10)
+# Seconds between sweeps for abandoned tasks
+TASK_REAPER_INTERVAL = getattr(settings, 'TASK_REAPER_INTERVAL', 15)
+
+TASK_CLAIM_SECONDS = histogram(
+    'neocxr_task_claim_seconds', 'Time to claim tasks', ['result']
+)
+TASK_LOCKS_REAPED = counter(
+    'neocxr_task_locks_reaped_total', 'Abandoned task locks returned to the queue'
+)
+
+def queue_status(status: TaskStatus):
+    """status rendered inline, so the planner can match the queue's partial index
+
+    A bound parameter hides the value from PostgreSQL's generic plans
+    and from SQLite's planner, which then fall back to a full index.
+    """
+    return literal(status, Task.status.type, literal_execute=True)
+
+def claim_candidates(dialect_name: str, status: TaskStatus, limit: int):
+    """SELECT of the next tasks to claim from one queue, in scheduler order
+
+    Served by the queue's partial index on (priority DESC, created_at, id),
+    so picking the head of the queue stays O(log n) however long it gets.
+    """
+    candidates = select(Task.id).where(
+        Task.status == queue_status(status)
+    ).order_by(Task.priority.desc(), Task.created_at, Task.id).limit(limit)
+    if dialect_name == 'postgresql':
+        candidates = candidates.with_for_update(skip_locked=True)
+    return candidates
+
+def claim_tasks(db: Session, user: User, count: int = 1) -> List[Task]:
+    """Lock up to count tasks for user, walking the role's queues in order
+
+    One UPDATE per queue. On PostgreSQL the candidate rows are picked with
+    FOR UPDATE SKIP LOCKED, so concurrent claims take different rows
+    instead of waiting on each other. SQLite serialises writers, which
+    makes the same UPDATE atomic. The status check in the outer WHERE
+    keeps a task from being claimed twice if a candidate changed between
+    the subquery and the update.
+    """
+    now = datetime.utcnow()
+    dialect_name = db.get_bind().dialect.name
+    queues = scheduler.queues(user.role)
+
+    started = time.perf_counter()
+    claimed = []
+    for status in queues:
+        remaining = count - len(claimed)
+        if remaining <= 0:
+            break
+        taken = db.execute(
+            update(Task)
+            .where(Task.id.in_(claim_candidates(dialect_name, status, remaining)), Task.status == status)
+            .values(
+                status=TaskStatus.LOCKED,
+                claimed_from=status,
+                assignee_id=user.id,
+                # Backstop only; heartbeats extend the lease, not this column
+                lock_expires_at=now + timedelta(seconds=LEASE_TTL),
+                updated_at=now
+            )
+            .returning(Task.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        bump(db, task_deltas(status, TaskStatus.LOCKED, count=len(taken)))
+        claimed += taken
+    db.commit()
+    for task_id in claimed:
+        lease_store.grant(task_id, user.id)
+    TASK_CLAIM_SECONDS.observe(time.perf_counter() - started, result='claimed' if claimed else 'empty')
+
+    if not claimed:
+        return []
+    tasks = db.query(Task).filter(Task.id.in_(claimed)).all()
+    # RETURNING order is unspecified; hand tasks out in claim order
+    return sorted(tasks, key=lambda task: (queues.index(task.claimed_from), -task.priority, task.created_at, task.id))
+
+def claim_next_task(db: Session, user: User) -> Optional[Task]:
+    """Lock the task at the head of the user's queues"""
+    tasks = claim_tasks(db, user, 1)
+    return tasks[0] if tasks else None
+
+def upcoming_tasks(db: Session, user: User, limit: int) -> List[Tuple[int, int]]:
+    """(task id, study id) of the tasks the user would claim next, without locking them"""
+    upcoming = []
+    for status in scheduler.queues(user.role):
+        if len(upcoming) >= limit:
+            break
+        upcoming += db.query(Task.id, Task.study_id).filter(
+            Task.status == status
+        ).order_by(Task.priority.desc(), Task.created_at, Task.id).limit(limit - len(upcoming)).all()
+    return upcoming
+
+def heartbeat(db: Session, task_id: int, user: User) -> Optional[float]:
+    """Extend user's lease on a task; returns the new expiry, None if the task is not theirs
+
+    The common case touches only the lease store. The database is read
+    only when the store has no lease, e.g. after an API restart with the
+    in-memory store, to re-establish it for a task the user still holds.
+    """
+    expires_at = lease_store.renew(task_id, user.id)
+    if expires_at is not None:
+        return expires_at
+
+    task = db.query(Task.id).filter(
+        Task.id == task_id,
+        Task.assignee_id == user.id,
+        Task.status == TaskStatus.LOCKED
+    ).first()
+    if task is None:
+        return None
+    return lease_store.grant(task_id, user.id)
+
+def requeue_status():
+    """SQL expression for the queue a locked task goes back to"""
+    return func.coalesce(Task.claimed_from, literal(TaskStatus.QUEUED, Task.status.type))
+
+def release_expired_locks(db: Session) -> int:
+    """Return locked tasks without a live lease to the queue they were claimed from"""
+    now = datetime.utcnow()
+    # Past the backstop expiry written at claim time; heartbeats never move it
+    candidates = db.execute(
+        select(Task.id).where(Task.status == queue_status(TaskStatus.LOCKED), Task.lock_expires_at < now)
+    ).scalars().all()
+    if not candidates or time.time() < lease_store.authoritative_at:
+        db.rollback()
+        return 0
+
+    live = lease_store.alive(candidates)
+    abandoned = [task_id for task_id in candidates if task_id not in live]
+    if not abandoned:
+        db.rollback()
+        return 0
+
+    requeued = db.execute(
+        update(Task)
+        .where(Task.id.in_(abandoned), Task.status == TaskStatus.LOCKED)
+        .values(status=requeue_status(), claimed_from=None, assignee_id=None, lock_expires_at=None)
+        .returning(Task.id, Task.status)
+        .execution_options(synchronize_session=False)
+    ).all()
+    bump(db, merge(*[task_deltas(TaskStatus.LOCKED, status) for _, status in requeued]))
+    db.commit()
+
+    # A lease granted since the check must not keep a stale viewer's heartbeats alive
+    for task_id, _ in requeued:
+        lease_store.release(task_id)
+    return len(requeued)
+
+class LeaseReaper:
+    """Background thread that periodically requeues tasks whose lease has lapsed"""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or TASK_REAPER_INTERVAL
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='lease-reaper', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sweep()
+
+    def sweep(self) -> int:
+        db = SessionLocal()
+        try:
+            released = release_expired_locks(db)
+        except Exception as e:
+            db.rollback()
+            print(f"Lease reaper error: {e}")
+            return 0
+        finally:
+            db.close()
+
+        if released:
+            TASK_LOCKS_REAPED.inc(released)
+            print(f"Requeued {released} abandoned tasks")
+        return released
+
+lease_reaper = LeaseReaper()
@@ -0,0 +1,113 @@
+# apps/api/app/services/thumbnails.py
+import base64
+import io
+import math
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+# Sizes rendered at ingest; the instance's thumbnail_path is the default one
+THUMBNAIL_SIZES = tuple(sorted(getattr(settings, 'THUMBNAIL_SIZES', (64, 128, 256, 512))))
+THUMBNAIL_DEFAULT_SIZE = getattr(settings, 'THUMBNAIL_DEFAULT_SIZE', 256)
+THUMBNAIL_QUALITY = getattr(settings, 'THUMBNAIL_QUALITY', 85)
+
+def sized_path(thumbnail_path: str, size: int) -> Path:
+    """Path of one standard size, next to the instance's default thumbnail"""
+    path = Path(thumbnail_path)
+    stem = path.stem.rsplit('_thumb', 1)[0]
+    return path.with_name(f"{stem}_thumb_{size}.jpg")
+
+def _fit(img: Image.Image, size: int) -> Image.Image:
+    """Copy of img downscaled to fit within size x size; img itself if it already fits"""
+    if img.width <= size and img.height <= size:
+        return img
+    img = img.copy()
+    img.thumbnail((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return img
+
+def write_thumbnails(image: np.ndarray, cache_dir: Path, sop_uid: str) -> str:
+    """Write every standard size from one rendered frame; returns the default size's path"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # Largest first, each size reduced from the previous one
+    img = Image.fromarray(image)
+    for size in reversed(THUMBNAIL_SIZES):
+        img = _fit(img, size)
+        img.save(cache_dir / f"{sop_uid}_thumb_{size}.jpg", 'JPEG', quality=THUMBNAIL_QUALITY)
+
+    default_size = THUMBNAIL_DEFAULT_SIZE if THUMBNAIL_DEFAULT_SIZE in THUMBNAIL_SIZES else THUMBNAIL_SIZES[-1]
+    return str(cache_dir / f"{sop_uid}_thumb_{default_size}.jpg")
+
+def nearest_thumbnail(thumbnail_path: Optional[str], size: int) -> Optional[Path]:
+    """Smallest precomputed thumbnail at least size pixels, if there is one on disk
+
+    Instances ingested before standard sizes existed only have their
+    original thumbnail; the sizes it covers are derived from it on first
+    use, and it is served as is for anything larger.
+    """
+    if not thumbnail_path:
+        return None
+    for standard_size in THUMBNAIL_SIZES:
+        if standard_size >= size:
+            path = sized_path(thumbnail_path, standard_size)
+            if path.exists():
+                return path
+
+    path = Path(thumbnail_path)
+    if not path.exists():
+        return None
+    return _derive_sizes(path, size) or path
+
+def _derive_sizes(thumbnail_path: Path, size: int) -> Optional[Path]:
+    """Write the standard sizes a legacy thumbnail can provide; returns the one serving size"""
+    nearest = None
+    with Image.open(thumbnail_path) as img:
+        img.load()
+        # Largest first, each size reduced from the previous one
+        for standard_size in reversed(THUMBNAIL_SIZES):
+            if standard_size > max(img.size):
+                continue
+            img = _fit(img, standard_size)
+            path = sized_path(str(thumbnail_path), standard_size)
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            img.save(tmp_path, 'JPEG', quality=THUMBNAIL_QUALITY)
+            os.replace(tmp_path, path)
+            if standard_size >= size:
+                nearest = path
+    return nearest
+
+def build_sprite(images: List[Tuple[int, Image.Image]], cell_size: int) -> Dict:
+    """Pack thumbnails into one JPEG grid of cell_size cells, with an offset map"""
+    columns = max(1, math.ceil(math.sqrt(len(images))))
+    rows = max(1, math.ceil(len(images) / columns))
+    # Greyscale unless a colour image is in the batch
+    mode = 'L' if all(img.mode == 'L' for _, img in images) else 'RGB'
+    sprite = Image.new(mode, (columns * cell_size, rows * cell_size))
+
+    offsets = {}
+    for position, (instance_id, img) in enumerate(images):
+        img = _fit(img, cell_size)
+        if img.mode != mode:
+            img = img.convert(mode)
+
+        x = (position % columns) * cell_size
+        y = (position // columns) * cell_size
+        sprite.paste(img, (x, y))
+        offsets[str(instance_id)] = {'x': x, 'y': y, 'width': img.width, 'height': img.height}
+
+    out = io.BytesIO()
+    sprite.save(out, 'JPEG', quality=THUMBNAIL_QUALITY)
+    return {
+        'format': 'jpeg',
+        'cell_size': cell_size,
+        'width': sprite.width,
+        'height': sprite.height,
+        'sprite': base64.b64encode(out.getvalue()).decode('ascii'),
+        'offsets': offsets,
+    }
@@ -0,0 +1,110 @@
+# apps/api/app/services/tiles.py
+import json
+import math
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.pixel_cache import pixel_cache
+from app.services.rendering import render_frame
+from app.services.store import source_version
+
+TILE_SIZE = getattr(settings, 'TILE_SIZE', 256)
+TILE_QUALITY = getattr(settings, 'TILE_QUALITY', 90)
+# Build pyramids in the pixel stage instead of on first view
+TILES_AT_INGEST = getattr(settings, 'TILES_AT_INGEST', False)
+
+MANIFEST_NAME = 'pyramid.json'
+
+class TilePyramid:
+    """Multi-resolution JPEG tiles of the first frame, under CACHE_DIR/tiles
+
+    Level 0 is an overview that fits in a single tile; each level doubles
+    the resolution up to the full image at levels - 1. The manifest is
+    written last, so its presence means the pyramid is complete.
+    """
+
+    def __init__(self, root: str = None, tile_size: int = None):
+        self.root = Path(root or Path(settings.CACHE_DIR) / 'tiles')
+        self.tile_size = tile_size or TILE_SIZE
+
+    def directory(self, instance_id: int, version: str) -> Path:
+        return self.root / str(instance_id) / version
+
+    def tile_path(self, instance_id: int, version: str, level: int, x: int, y: int) -> Path:
+        return self.directory(instance_id, version) / str(level) / f"{x}_{y}.jpg"
+
+    def manifest(self, instance_id: int, version: str) -> Optional[Dict]:
+        try:
+            with open(self.directory(instance_id, version) / MANIFEST_NAME) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def ensure(self, instance_id: int, file_path: str) -> Dict:
+        """Manifest for the instance, building the pyramid if needed"""
+        version = source_version(file_path)
+        manifest = self.manifest(instance_id, version)
+        if manifest is not None:
+            return manifest
+
+        ds, pixels = pixel_cache.frame(instance_id, file_path, 0)
+        return self.build(instance_id, version, render_frame(ds, pixels))
+
+    def build(self, instance_id: int, version: str, image: np.ndarray) -> Dict:
+        """Cut a rendered 8-bit image into tiles and write the manifest"""
+        height, width = image.shape[:2]
+        levels = max(0, math.ceil(math.log2(max(width, height) / self.tile_size))) + 1
+
+        out_dir = self.directory(instance_id, version)
+        tmp_dir = out_dir.with_name(f".{version}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        level_image = Image.fromarray(image)
+        for level in reversed(range(levels)):
+            level_dir = tmp_dir / str(level)
+            level_dir.mkdir(parents=True)
+            for y in range(math.ceil(level_image.height / self.tile_size)):
+                for x in range(math.ceil(level_image.width / self.tile_size)):
+                    box = (
+                        x * self.tile_size,
+                        y * self.tile_size,
+                        min((x + 1) * self.tile_size, level_image.width),
+                        min((y + 1) * self.tile_size, level_image.height)
+                    )
+                    level_image.crop(box).save(level_dir / f"{x}_{y}.jpg", 'JPEG', quality=TILE_QUALITY)
+            if level:
+                # 2x2 box filter to the next coarser level
+                level_image = level_image.reduce(2)
+
+        manifest = {
+            'width': width,
+            'height': height,
+            'tile_size': self.tile_size,
+            'levels': levels,
+            'format': 'jpeg',
+            'version': version,
+        }
+        with open(tmp_dir / MANIFEST_NAME, 'w') as f:
+            json.dump(manifest, f)
+
+        # Replace any pyramid of an older version of the file
+        instance_dir = out_dir.parent
+        if instance_dir.exists():
+            for old_dir in instance_dir.iterdir():
+                if not old_dir.name.startswith('.'):
+                    shutil.rmtree(old_dir, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, out_dir)
+        except OSError:
+            # Another worker finished the same pyramid first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        return manifest
+
+tile_pyramid = TilePyramid()
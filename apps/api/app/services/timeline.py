@@ -0,0 +1,192 @@
+# apps/api/app/services/timeline.py
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import and_, cast, Date, func, null, or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Annotation, Task, TaskStatus
+# Buckets split at the same midnights as the overview's today_done,
+# unless the caller picks a zone
+from app.services.counters import COMPLETED_BY_DAY, COUNTERS_TOPIC, day_key, STATS_TIMEZONE
+from app.services.events import broker
+TIMELINE_MAX_DAYS = getattr(settings, 'TIMELINE_MAX_DAYS', 731)
+# Closed buckets kept in memory; each is a few counts
+TIMELINE_CACHE_SIZE = getattr(settings, 'TIMELINE_CACHE_SIZE', 20000)
+# Seconds a closed bucket is trusted without a counter change to say otherwise
+TIMELINE_CACHE_TTL = getattr(settings, 'TIMELINE_CACHE_TTL', 600)
+
+GRANULARITIES = ('day', 'week', 'month')
+DIMENSIONS = ('user', 'class')
+
+def zone(name: Optional[str]) -> ZoneInfo:
+    """ZoneInfo for name; ValueError if the zone is unknown"""
+    try:
+        return ZoneInfo(name or STATS_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown time zone: {name}")
+
+def bucket_start(day: date, granularity: str) -> date:
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start: date, granularity: str) -> date:
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+def _utc(day: date, tz: ZoneInfo) -> datetime:
+    """Local midnight of day as the naive UTC timestamps the tables store"""
+    return datetime.combine(day, time.min, tzinfo=tz).astimezone(ZoneInfo('UTC')).replace(tzinfo=None)
+
+def _bucket_column(column, dialect_name: str, tz: ZoneInfo, granularity: str, at: datetime):
+    """SQL expression for the local bucket start of a UTC timestamp column"""
+    if dialect_name == 'postgresql':
+        local = func.timezone(tz.key, func.timezone('UTC', column))
+        return cast(func.date_trunc(granularity, local), Date)
+
+    # SQLite has no zone database; shift by the zone's offset at the end of the range
+    offset = int(at.replace(tzinfo=ZoneInfo('UTC')).astimezone(tz).utcoffset().total_seconds() // 60)
+    local = func.datetime(column, f'{offset:+d} minutes')
+    if granularity == 'week':
+        return func.date(local, 'weekday 0', '-6 days')
+    if granularity == 'month':
+        return func.date(local, 'start of month')
+    return func.date(local)
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) and not isinstance(value, datetime) else date.fromisoformat(str(value)[:10])
+
+class TimelineCache:
+    """Bucket counts for periods that have ended
+
+    Ended periods change only when a completed task is edited, reopened
+    or deleted, which moves it out of its day. The committed counter
+    deltas report those moves, from every process with the Redis
+    broker, and clear the cache. Changes the counters do not see, such
+    as raw SQL or findings added to an old task, expire after
+    TIMELINE_CACHE_TTL.
+    """
+
+    def __init__(self, size: int = None, ttl: float = None):
+        self.size = size or TIMELINE_CACHE_SIZE
+        self.ttl = TIMELINE_CACHE_TTL if ttl is None else ttl
+        self._buckets: 'OrderedDict[tuple, Tuple[float, Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._watching = False
+
+    def get(self, key: tuple) -> Optional[Dict]:
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is None:
+                return None
+            if monotonic() - entry[0] >= self.ttl:
+                del self._buckets[key]
+                return None
+            self._buckets.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: tuple, counts: Dict):
+        with self._lock:
+            self._buckets[key] = (monotonic(), counts)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.size:
+                self._buckets.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def watch(self):
+        """Start clearing on counter changes that move completions between days"""
+        with self._lock:
+            if self._watching:
+                return
+            self._watching = True
+        broker.on(COUNTERS_TOPIC, self._counters_changed)
+
+    def _counters_changed(self, changes):
+        # New completions land in the open bucket of every zone; anything
+        # else took a task out of, or put one into, a day that has ended
+        today = day_key(datetime.utcnow())
+        if any(name == COMPLETED_BY_DAY and (value < 0 or scope != today) for name, scope, value in changes):
+            self.clear()
+
+timeline_cache = TimelineCache()
+
+def timeline_query(dialect_name: str, tz: ZoneInfo, granularity: str, group_by: Optional[str],
+                   first: date, last: date):
+    """One grouped SELECT of (bucket start, group, completed tasks) for buckets first..last
+
+    Served by ix_tasks_status_updated_assignee; the class breakdown joins
+    annotations through their task_id index.
+    """
+    range_start = _utc(first, tz)
+    range_end = _utc(next_bucket(last, granularity), tz)
+    period = _bucket_column(Task.updated_at, dialect_name, tz, granularity, range_end).label('period')
+    condition = and_(
+        Task.status == TaskStatus.COMPLETED,
+        Task.updated_at >= range_start,
+        Task.updated_at < range_end
+    )
+
+    if group_by == 'user':
+        return select(period, Task.assignee_id, func.count()).where(condition).group_by(period, Task.assignee_id)
+    if group_by == 'class':
+        # Tasks completed with at least one finding of the class
+        return select(period, Annotation.class_id, func.count(func.distinct(Task.id))).join(
+            Annotation, Annotation.task_id == Task.id
+        ).where(
+            condition, or_(Annotation.polarity.is_(None), Annotation.polarity != 'neg')
+        ).group_by(period, Annotation.class_id)
+    return select(period, null(), func.count()).where(condition).group_by(period)
+
+def completion_timeline(db: Session, days: int, granularity: str = 'day',
+                        group_by: Optional[str] = None, tz_name: Optional[str] = None,
+                        now: datetime = None) -> List[Tuple[date, Dict]]:
+    """Completed tasks per local bucket over the last days days
+
+    Returns (bucket start, counts) pairs in date order, including empty
+    buckets. counts maps the group_by value (user id or class id) to the
+    number of completed tasks, or None to the total when ungrouped. Only
+    buckets not yet cached are read, in one grouped query, so a long
+    range costs one round-trip and a repeat costs one for the open bucket.
+    """
+    tz = zone(tz_name)
+    now = now or datetime.utcnow()
+    today = now.replace(tzinfo=ZoneInfo('UTC')).astimezone(tz).date()
+
+    buckets = []
+    start = bucket_start(today - timedelta(days=days - 1), granularity)
+    while start <= today:
+        buckets.append(start)
+        start = next_bucket(start, granularity)
+    current = buckets[-1]
+
+    timeline_cache.watch()
+    key = (tz.key, granularity, group_by)
+    counts = {bucket: timeline_cache.get(key + (bucket,)) for bucket in buckets[:-1]}
+    missing = [bucket for bucket in buckets if counts.get(bucket) is None]
+
+    if missing:
+        query = timeline_query(db.get_bind().dialect.name, tz, granularity, group_by, missing[0], current)
+        fetched = {day: {} for day in missing}
+        for value, group, count in db.execute(query):
+            fetched.setdefault(_as_date(value), {})[group] = count
+
+        for day in missing:
+            counts[day] = fetched[day]
+            if day != current:
+                timeline_cache.put(key + (day,), fetched[day])
+
+    return [(day, counts[day]) for day in buckets]
\ No newline at end of file
@@ -0,0 +1,136 @@
+# apps/api/app/services/transcode.py
+import os
+import shutil
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from pydicom.dataset import Dataset
+from pydicom.uid import DeflatedExplicitVRLittleEndian, ExplicitVRLittleEndian, RLELossless
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import Instance
+from app.services.journal import file_digest
+from app.services.store import object_path, STORE_DEDUP
+
+# Stored transfer syntax: 'original' keeps what the modality sent
+STORE_TRANSFER_SYNTAX = getattr(settings, 'STORE_TRANSFER_SYNTAX', 'original')
+# Keep the modality's bytes next to a transcoded file as <name>.orig;
+# deduplicated originals are kept as their own object regardless
+STORE_KEEP_ORIGINAL = getattr(settings, 'STORE_KEEP_ORIGINAL', False)
+
+TRANSFER_SYNTAXES = {
+    'explicit-le': ExplicitVRLittleEndian,
+    'rle': RLELossless,
+    'deflate': DeflatedExplicitVRLittleEndian,
+}
+
+class Transcoder:
+    """Rewrites stored instances in a syntax that is cheap to decode
+
+    Runs in the pixel stage on pixels that were decoded anyway, so the
+    slow decode (e.g. JPEG 2000) is paid once at ingest. Only lossless
+    targets are offered; a lossy source keeps its lossy pixels, it just
+    stops paying for the lossy codec. The new file replaces the stored
+    one atomically and never touches the inode of a hardlinked inbox file.
+
+    Content-addressed objects are never rewritten: other instances may
+    share them, and their name is their digest. With dedup the
+    transcoded file is stored as a new object under its own digest and
+    the original object stays where it is.
+    """
+
+    def __init__(self, policy: str = None, keep_original: Optional[bool] = None, dedup: Optional[bool] = None):
+        policy = policy or STORE_TRANSFER_SYNTAX
+        if policy != 'original' and policy not in TRANSFER_SYNTAXES:
+            raise ValueError(f"Unknown store transfer syntax: {policy}")
+        self.target = TRANSFER_SYNTAXES.get(policy)
+        self.keep_original = STORE_KEEP_ORIGINAL if keep_original is None else keep_original
+        self.dedup = STORE_DEDUP if dedup is None else dedup
+
+    def transcode(self, path: str, ds: Dataset, decode_ms: float) -> Tuple[str, Dict]:
+        """Store ds (pixels already decoded) in the target syntax; returns the path and storage metadata
+
+        decode_ms_stored is left as None for a transcoded file; the first
+        decode of it, in the pixel cache, fills it in.
+        """
+        original_syntax = str(ds.file_meta.TransferSyntaxUID)
+        storage = {
+            'transfer_syntax_original': original_syntax,
+            'transfer_syntax_stored': original_syntax,
+            'decode_ms_original': round(decode_ms, 1),
+            'decode_ms_stored': round(decode_ms, 1),
+            'size_original': os.path.getsize(path),
+            'size_stored': os.path.getsize(path),
+        }
+        if self.target is None or original_syntax == self.target:
+            return path, storage
+
+        if ds.file_meta.TransferSyntaxUID.is_compressed:
+            # Reuses the decoded pixel array; fixes up photometric interpretation
+            ds.decompress()
+        if self.target == RLELossless:
+            ds.compress(RLELossless, ds.pixel_array)
+        else:
+            ds.file_meta.TransferSyntaxUID = self.target
+            ds.is_little_endian = True
+            ds.is_implicit_VR = False
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            ds.save_as(tmp_path, write_like_original=False)
+            if self.dedup:
+                stored_path = str(object_path(file_digest(tmp_path)))
+                # Already stored by an identical instance; leave its mtime alone
+                if not os.path.exists(stored_path):
+                    os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+                    os.replace(tmp_path, stored_path)
+                storage['path_original'] = path
+            else:
+                if self.keep_original:
+                    _preserve(path, f"{path}.orig")
+                os.replace(tmp_path, path)
+                stored_path = path
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+        storage.update({
+            'transfer_syntax_stored': str(self.target),
+            'decode_ms_stored': None,
+            'size_stored': os.path.getsize(stored_path),
+        })
+        return stored_path, storage
+
+def _preserve(path: str, orig_path: str):
+    tmp_path = f"{orig_path}.{os.getpid()}.tmp"
+    try:
+        # Same inode as the original; the os.replace of path leaves it alone
+        os.link(path, tmp_path)
+    except OSError:
+        shutil.copy2(path, tmp_path)
+    os.replace(tmp_path, orig_path)
+
+def decode_timed(ds: Dataset) -> Tuple[np.ndarray, float]:
+    """Pixel array of ds and the milliseconds the decode took"""
+    started = time.perf_counter()
+    pixel_array = ds.pixel_array
+    return pixel_array, (time.perf_counter() - started) * 1000
+
+def record_stored_decode(instance_id: int, decode_ms: float):
+    """Fill in decode_ms_stored of a transcoded instance from its first decode"""
+    db = SessionLocal()
+    try:
+        instance = db.get(Instance, instance_id)
+        storage = (instance.meta_json or {}).get('storage') if instance is not None else None
+        if not storage or storage.get('decode_ms_stored') is not None:
+            return
+        instance.meta_json = {**instance.meta_json, 'storage': {**storage, 'decode_ms_stored': round(decode_ms, 1)}}
+        db.commit()
+    except Exception as e:
+        # Only a statistic; the view itself has its pixels
+        db.rollback()
+        print(f"Error recording decode time of instance {instance_id}: {e}")
+    finally:
+        db.close()
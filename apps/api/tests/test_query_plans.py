@@ -0,0 +1,41 @@
+# apps/api/tests/test_query_plans.py
+"""Query-plan regressions for the hot queries
+
+Runs on a throwaway SQLite file; set QUERY_PLANS_DATABASE_URL to an
+EMPTY scratch PostgreSQL database to check its planner instead.
+Latency budgets at a realistic size are left to
+app.scripts.check_query_plans.
+"""
+import os
+import random
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core.database import Base
+from app.scripts.check_query_plans import explain, hot_queries, plan_problems, seed
+
+PLAN_TASKS = 20000
+
+@pytest.fixture(scope='module')
+def engine(tmp_path_factory):
+    url = os.environ.get('QUERY_PLANS_DATABASE_URL') or f"sqlite:///{tmp_path_factory.mktemp('plans') / 'plans.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.connect() as connection:
+        seed(connection, PLAN_TASKS, 2, random.Random(1))
+        connection.commit()
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('VACUUM ANALYZE' if engine.dialect.name == 'postgresql' else 'ANALYZE'))
+
+    yield engine
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+@pytest.mark.parametrize('name', [query[0] for query in hot_queries('sqlite')])
+def test_hot_query_plan(engine, name):
+    _, statement, _, index = next(query for query in hot_queries(engine.dialect.name) if query[0] == name)
+    with engine.connect() as connection:
+        steps = explain(connection, statement)
+    assert not plan_problems(steps, index), steps
\ No newline at end of file
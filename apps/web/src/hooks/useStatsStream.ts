@@ -0,0 +1,106 @@
+// apps/web/src/hooks/useStatsStream.ts
+import { useEffect, useState } from 'react'
+import { useQueryClient } from '@tanstack/react-query'
+import { api } from '@/lib/api'
+
+const RECONNECT_DELAY = 5000
+// XHR keeps the whole response text, so long streams are reopened
+// once this much has been received; the server resends the snapshot
+const MAX_STREAM_BYTES = 1 << 20
+
+type Stats = Record<string, number>
+
+interface StatsDelta {
+  changes: Stats
+  set?: Stats
+}
+
+// Keeps the ['stats'] query current from the server's event stream.
+// Read through XHR progress so the stream goes through the api client
+// and its auth, which EventSource cannot do.
+export function useStatsStream(): boolean {
+  const queryClient = useQueryClient()
+  const [connected, setConnected] = useState(false)
+
+  useEffect(() => {
+    let controller: AbortController | null = null
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined
+    let stopped = false
+
+    const handleEvent = (name: string, data: string) => {
+      if (name === 'snapshot') {
+        queryClient.setQueryData(['stats'], JSON.parse(data))
+        setConnected(true)
+      } else if (name === 'delta') {
+        const delta: StatsDelta = JSON.parse(data)
+        queryClient.setQueryData(['stats'], (stats: Stats | undefined) => {
+          if (!stats) return stats
+          const next = { ...stats, ...delta.set }
+          for (const [field, change] of Object.entries(delta.changes)) {
+            next[field] = (next[field] || 0) + change
+          }
+          return next
+        })
+      } else if (name === 'resync') {
+        queryClient.invalidateQueries({ queryKey: ['stats'] })
+      }
+    }
+
+    const connect = () => {
+      const current = new AbortController()
+      controller = current
+      let seen = 0
+      let buffer = ''
+      let recycled = false
+
+      api.get('/stats/stream', {
+        responseType: 'text',
+        timeout: 0,
+        signal: current.signal,
+        onDownloadProgress: (progress: any) => {
+          const text: string = progress.event?.target?.responseText ?? ''
+          buffer += text.slice(seen)
+          seen = text.length
+
+          // Events are separated by a blank line
+          let end
+          while ((end = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, end)
+            buffer = buffer.slice(end + 2)
+            let name = 'message'
+            const data: string[] = []
+            for (const line of block.split('\n')) {
+              if (line.startsWith('event: ')) name = line.slice(7)
+              else if (line.startsWith('data: ')) data.push(line.slice(6))
+            }
+            if (data.length) handleEvent(name, data.join('\n'))
+          }
+
+          if (seen > MAX_STREAM_BYTES) {
+            recycled = true
+            current.abort()
+          }
+        },
+      }).catch(() => undefined).finally(() => {
+        if (stopped) return
+        if (recycled) {
+          // Reopened straight away; polling stays off meanwhile
+          connect()
+          return
+        }
+        setConnected(false)
+        reconnectTimer = setTimeout(connect, RECONNECT_DELAY)
+      })
+    }
+
+    connect()
+
+    return () => {
+      stopped = true
+      clearTimeout(reconnectTimer)
+      controller?.abort()
+    }
+  }, [queryClient])
+
+  return connected
+}
\ No newline at end of file
@@ -3,24 +3,35 @@ import { useQuery } from '@tanstack/react-query'
 import { useNavigate } from 'react-router-dom'
 import { Activity, CheckCircle, FileText, User, Clock, Queue } from 'lucide-react'
 import { api } from '@/lib/api'
+import { cornerstoneService } from '@/services/CornerstoneService'
 import { Button } from '@/components/ui/button'
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card'
 import { useAuthStore } from '@/stores/authStore'
+import { useStatsStream } from '@/hooks/useStatsStream'
 
 export function Dashboard() {
   const navigate = useNavigate()
   const user = useAuthStore((state) => state.user)
   
+  // Pushed by the server while the stream is up; polling is the fallback
+  const live = useStatsStream()
+  
   const { data: stats, isLoading } = useQuery({
     queryKey: ['stats'],
     queryFn: () => api.get('/stats/overview').then(res => res.data),
-    refetchInterval: 30000, // 30 saniyede bir güncelle
+    refetchInterval: live ? false : 30000, // 30 saniyede bir güncelle
   })
   
   const handleStartSegmentation = async () => {
     try {
-      const response = await api.post('/tasks/next')
+      const response = await api.post('/tasks/next', null, { params: { prefetch: 2 } })
       const task = response.data
+      
+      // Start loading the next cases while this one is annotated
+      const prefetchIds = response.headers['x-prefetch-instance-ids']
+      if (prefetchIds) {
+        cornerstoneService.prefetchDicomImages(prefetchIds.split(','))
+      }
       navigate(`/viewer/${task.id}`)
     } catch (error) {
       console.error('Görev alınamadı:', error)
@@ -25,6 +25,8 @@ export function PathologyPanel({ selectedPathology, onSelect }: PathologyPanelPr
   const { data: pathologies, isLoading } = useQuery({
     queryKey: ['ontology', 'pathology'],
     queryFn: () => api.get('/ontology/classes?kind=pathology').then(res => res.data),
+    // Changes rarely; refetches are revalidated by ETag and answered with 304
+    staleTime: 5 * 60 * 1000,
   })
   
   if (isLoading) {
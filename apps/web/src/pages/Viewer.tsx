@@ -85,6 +85,21 @@ export function Viewer() {
     }
   }, [task, loadImage])
   
+  // Keep the task lease alive while the case is open
+  useEffect(() => {
+    if (!taskId) return
+    
+    const interval = setInterval(() => {
+      api.post(`/tasks/${taskId}/heartbeat`).catch((error: any) => {
+        if (error.response?.status === 409) {
+          toast.error('Görev kilidi kaybedildi')
+        }
+      })
+    }, 30000)
+    
+    return () => clearInterval(interval)
+  }, [taskId])
+  
   // Keyboard shortcuts
   useEffect(() => {
     const handleKeyDown = (event: KeyboardEvent) => {
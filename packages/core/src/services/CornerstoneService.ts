@@ -85,6 +85,14 @@ export class CornerstoneService {
     }
   }
   
+  public async prefetchDicomImages(instanceIds: string[]): Promise<void> {
+    // Fill the image cache in the background; failures surface on real load
+    await this.initialize()
+    await Promise.allSettled(
+      instanceIds.map((instanceId) => cornerstone.loadAndCacheImage(`wadouri:/api/v1/dicom/${instanceId}/p10`))
+    )
+  }
+  
   public enableElement(element: HTMLDivElement): void {
     if (!this.initialized) {
       throw new Error('Cornerstone not initialized')